@@ -45,11 +45,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'store.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'cart.middleware.CartMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -67,6 +69,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'cart.context_processor.cart',
+                'store.context_processors.category_menu',
             ],
         },
     },
@@ -82,10 +85,39 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # a transaction that writes takes the write lock at BEGIN, so two checkouts wait
+        # for each other instead of failing with "database is locked"
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        # the tests use a file, so the stock test can write from several threads
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The entries are kept in files, so every process of the site sees the same ones
+# (use Redis or Memcached when the site is served from several machines).
+# The default cache has the product cards (two entries per product), the sold out products,
+# and the order counts, so it is allowed many entries.
+# The catalog version has a cache of its own, so culling the default cache can't drop it.
+# The categories and the filter counts are kept in the memory of each process
+# and read again when the version changes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'default',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'versions',
+        'TIMEOUT': None,
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -122,10 +154,26 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = ['static/']
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles') #where collectstatic puts the files and their .gz and .br copies
 
 
 MEDIA_URL = 'media/' #when an image is uploaded, it would go in the media dir
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') #so it can use the url
+IMAGE_WORKERS = 2 #processes that make the resized copies of the product images
+# the uploads and the collected static files are saved under a name with the hash of their content
+STORAGES = {
+    'default': {'BACKEND': 'store.media.HashedMediaStorage'},
+    'staticfiles': {'BACKEND': 'store.compression.CompressedManifestStaticFilesStorage'},
+}
+# set to 'x-accel' (nginx) or 'x-sendfile' (Apache) to let the web server send the media files
+MEDIA_OFFLOAD = None
+MEDIA_OFFLOAD_PREFIX = '/protected-media/' #the internal nginx location of MEDIA_ROOT
+COMPRESS_MIN_SIZE = 1024 #HTML and JSON responses smaller than this are not compressed
+TEST_RUNNER = 'CosmeticsStore.test_runner.TestRunner'
+CHECKOUT_TTL = 30 * 60 #seconds the shipping info of a checkout is kept before the payment
+# count the hits and misses of the product card cache (see card_cache_stats); every listing
+# then rewrites two cache files, so it is only meant for measuring
+CARD_CACHE_STATS = False
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -0,0 +1,34 @@
+'''This module contains the test runner of the site.'''
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    '''This class runs the tests with the plain static files storage,
+    since the pages are rendered without running collectstatic first
+    and the manifest storage refuses files that are not in its manifest.
+    The caches are kept in a temporary directory, so the tests never read
+    or clear the cache of the site.'''
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_root = tempfile.mkdtemp(prefix='cosmetics-test-cache-')
+        self.test_settings = override_settings(
+            STORAGES={
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+            CACHES={alias: {**options, 'LOCATION': os.path.join(self.cache_root, alias)}
+                    for alias, options in settings.CACHES.items()},
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        shutil.rmtree(self.cache_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
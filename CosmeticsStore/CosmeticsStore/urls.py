@@ -15,14 +15,17 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from . import settings
-from django.conf.urls.static import static
+from store.media import serve_media, serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('store.urls')),
     path('cart/', include('cart.urls')),
     path('payment/', include('payment.urls')),
-    
-] + static(settings.MEDIA_URL, document_root = settings.MEDIA_ROOT) # allows us to upload images 
+    # the uploaded images, with ranges and caching (or sent by the web server, see MEDIA_OFFLOAD)
+    re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.*)$', serve_media, name='media'),
+    # the collected static files and their gzip and brotli copies
+    re_path(rf'^{settings.STATIC_URL.lstrip("/")}(?P<path>.*)$', serve_static, name='static'),
+] 
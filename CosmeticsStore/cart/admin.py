@@ -1,3 +1,18 @@
+'''This module adds the saved carts to the admin section of our site.'''
 from django.contrib import admin
+from .models import SavedCart, SavedCartItem
 
-# Register your models here.
+
+class SavedCartItemInline(admin.TabularInline):
+    '''This class creates a Saved Cart Item inline.'''
+    model = SavedCartItem
+    extra = 0
+
+
+class SavedCartAdmin(admin.ModelAdmin):
+    '''This class shows the lines of a saved cart in the admin section.'''
+    model = SavedCart
+    inlines = [SavedCartItemInline]
+
+
+admin.site.register(SavedCart, SavedCartAdmin)
@@ -1,5 +1,58 @@
 '''This module contains the class defining our cart.'''
-from store.models import Product, Profile
+from decimal import Decimal
+
+from store.models import Product
+
+
+class CartLine():
+    '''This class defines one line of the cart:
+    the product, its quantity and the price of the line.'''
+
+    def __init__(self, product: Product, quantity: int) -> None:
+        self.product = product
+        self.quantity = quantity
+        self.total = product.price * quantity
+
+
+class CartSnapshot():
+    '''This class prices the cart once with a single product query.
+    Products that no longer exist are left out of the lines
+    and their ids are kept in stale_ids.'''
+
+    def __init__(self, cart: dict, products: dict|None = None) -> None:
+        if products is None:
+            products = Product.objects.in_bulk([int(key) for key in cart])
+
+        self.lines = []
+        self.stale_ids = []
+        for key, value in cart.items():
+            product = products.get(int(key))
+            if product is None:
+                self.stale_ids.append(key)
+            else:
+                self.lines.append(CartLine(product, int(value)))
+
+        self.total = sum((line.total for line in self.lines), Decimal('0'))
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def as_dict(self) -> dict:
+        '''This function returns the lines, the number of lines and the total
+        in a form that can be sent as JSON.'''
+        return {
+            'lines': [{'product_id': line.product.id,
+                       'name': line.product.name,
+                       'price': str(line.product.price),
+                       'quantity': line.quantity,
+                       'total': str(line.total)} for line in self.lines],
+            'quantity': len(self.lines),
+            'total': str(self.total),
+        }
+
 
 class Cart():
     '''This class defines the cart of the store
@@ -8,43 +61,99 @@ class Cart():
     def __init__(self, request) -> None:
         self.session = request.session
         self.request = request
-        cart = self.session.get('session_key')
+        # the cart is put in the session only when it is changed,
+        # so visitors who never use the cart don't get a session saved
+        self.cart = self.session.get('session_key', {})
 
-        if 'session_key' not in request.session:
-            cart = self.session['session_key'] = {}
-
-        self.cart = cart
-
-    def add(self, product: Product|str, quantity: int, db_add = False) -> None:
+    def add(self, product: Product, quantity: int) -> None:
         '''This function is used to add a product in the cart.
         It checks first if the product isn't already inside.
         '''
-        if db_add:
-            # product here is a string
-            product_id = product
-        else:
-            product_id = str(product.id)
-        product_qty = str(quantity)
+        product_id = str(product.id)
 
         if product_id not in self.cart:
-            self.cart[product_id] = int(product_qty)
-        self.session.modified = True
-
-        if self.request.user.is_authenticated:
-            current_user = Profile.objects.filter(user__id=self.request.user.id)
-            str_cart = str(self.cart)
-            str_cart = str_cart.replace("\'","\"")
-            current_user.update(last_cart=str_cart)
+            self.cart[product_id] = int(quantity)
+        self.changed()
 
+    def changed(self) -> None:
+        '''This function marks the cart as changed.
+        The session is saved and CartMiddleware writes the cart of a logged in user
+        to the database once, when the request ends.'''
+        self.session['session_key'] = self.cart
+        self.request.cart_changed = True
+        self.request.cart_snapshot = None
 
     def __len__(self) -> int:
         return len(self.cart)
 
-    def get_products(self) -> object:
+    def snapshot(self) -> CartSnapshot:
+        '''This function returns the priced cart.
+        It is built once per request and shared by every Cart of the request
+        until the cart is changed. Products that were removed from the store
+        are also removed from the cart here.'''
+        snapshot = getattr(self.request, 'cart_snapshot', None)
+        if snapshot is None:
+            snapshot = self._keep_snapshot(CartSnapshot(self.cart))
+
+        return snapshot
+
+    def _keep_snapshot(self, snapshot: CartSnapshot) -> CartSnapshot:
+        '''This function stores the snapshot on the request
+        and removes the products that no longer exist from the cart.'''
+        self.request.cart_snapshot = snapshot
+        if snapshot.stale_ids:
+            for key in snapshot.stale_ids:
+                del self.cart[key]
+            self.session.modified = True
+            self.request.cart_changed = True
+        return snapshot
+
+    def apply(self, operations: list) -> CartSnapshot:
+        '''This function applies a list of add, update and delete operations to the cart.
+        Every operation is a dictionary with 'action', 'product_id' and 'product_qty'.
+        The products are checked with one query and the cart is changed only
+        if all the operations are valid, otherwise ValueError (also for adding
+        a sold out product) or Product.DoesNotExist is raised and the cart stays the same.
+        '''
+        changes = []
+        for operation in operations:
+            if not isinstance(operation, dict):
+                raise ValueError('Every operation must be an object.')
+            action = operation.get('action')
+            if action not in ('add', 'update', 'delete'):
+                raise ValueError(f'Unknown cart action: {action}')
+            product_id = int(operation['product_id'])
+            quantity = 0 if action == 'delete' else int(operation['product_qty'])
+            if action != 'delete' and quantity < 1:
+                raise ValueError('The quantity must be at least 1.')
+            changes.append((action, str(product_id), quantity))
+
+        product_ids = {int(key) for key in self.cart}
+        product_ids.update(int(key) for action, key, _ in changes if action != 'delete')
+        products = Product.objects.in_bulk(product_ids)
+        for action, key, _ in changes:
+            if action != 'delete' and int(key) not in products:
+                raise Product.DoesNotExist(f'No product with id {key}.')
+            if action == 'add' and products[int(key)].stock == 0:
+                raise ValueError(f'{products[int(key)].name} is sold out.')
+
+        new_cart = dict(self.cart)
+        for action, key, quantity in changes:
+            if action == 'add':
+                new_cart.setdefault(key, quantity)
+            elif action == 'update':
+                new_cart[key] = quantity
+            else:
+                new_cart.pop(key, None)
+
+        self.cart.clear()
+        self.cart.update(new_cart)
+        self.changed()
+        return self._keep_snapshot(CartSnapshot(self.cart, products))
+
+    def get_products(self) -> list:
         '''This function lists the products in the cart.'''
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        return products
+        return [line.product for line in self.snapshot().lines]
 
     def get_quantities(self)-> dict:
         '''This function returns the cart as a dictionary
@@ -57,13 +166,7 @@ class Cart():
         if product_id in self.cart:
             del self.cart[product_id]
 
-        self.session.modified = True
-
-        if self.request.user.is_authenticated:
-            current_user = Profile.objects.filter(user__id=self.request.user.id)
-            str_cart = str(self.cart) #'{'3':1}'
-            str_cart = str_cart.replace("\'","\"")
-            current_user.update(last_cart=str_cart)
+        self.changed()
 
     def update(self, product: Product, quantity: int)-> dict:
         '''This function updates the cart 
@@ -74,27 +177,10 @@ class Cart():
         ourcart = self.cart
         ourcart[product_id] = product_qty
 
-        self.session.modified = True
-
-        if self.request.user.is_authenticated:
-            current_user = Profile.objects.filter(user__id=self.request.user.id)
-            str_cart = str(self.cart)
-            str_cart = str_cart.replace("\'","\"")
-            current_user.update(last_cart=str_cart)
+        self.changed()
 
         return self.cart
 
-    def cart_total(self)-> int:
-        '''This function calculates the final price of all the products in the cart.'''
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        quantities = self.cart
-
-        total = 0
-        for key, value in quantities.items():
-            key = int(key)
-            for product in products:
-                if product.id == key:
-                    total = total + (product.price * value)
-
-        return total
+    def cart_total(self)-> Decimal:
+        '''This function returns the final price of all the products in the cart.'''
+        return self.snapshot().total
@@ -1,8 +1,11 @@
 '''This module contains a context processor so the cart icon 
 is shown correctly throughout all pages.
 '''
+from django.utils.functional import SimpleLazyObject
+
 from .cart import Cart
 
 def cart(request):
-    '''This function returns the correct cart of the customer in every page of the site.'''
-    return {'cart': Cart(request)}
\ No newline at end of file
+    '''This function returns the correct cart of the customer in every page of the site.
+    The cart is lazy, so the session is only read when a template uses the cart.'''
+    return {'cart': SimpleLazyObject(lambda: Cart(request))}
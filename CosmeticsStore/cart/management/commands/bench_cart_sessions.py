@@ -0,0 +1,90 @@
+'''This module contains a benchmark of the session writes
+made by the cart while anonymous visitors browse the catalog.'''
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from store.models import Category, Product
+from cart.cart import Cart
+
+
+def eager_cart(request):
+    '''This function is the context processor as it was before the lazy cart:
+    it puts an empty cart in the session of every visitor.'''
+    request.session.setdefault('session_key', {})
+    return {'cart': Cart(request)}
+
+
+class Command(BaseCommand):
+    '''This class crawls the catalog pages with new anonymous visitors
+    and counts the session rows and session writes, with the eager and the lazy cart.
+    Everything is rolled back at the end.'''
+    help = 'Counts the session writes the cart causes on a crawl of the catalog pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visitors', type=int, default=50)
+        parser.add_argument('--products', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            urls = self.catalog_urls(options['products'])
+            results = {}
+            for mode in ('eager', 'lazy'):
+                results[mode] = self.crawl(mode, urls, options['visitors'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{options['visitors']} visitors x {len(urls)} pages")
+        for mode, (rows, writes) in results.items():
+            self.stdout.write(f'{mode:>6}: {rows} session rows, {writes} session writes')
+        eager_rows, eager_writes = results['eager']
+        lazy_rows, lazy_writes = results['lazy']
+        self.stdout.write(f'saved: {eager_rows - lazy_rows} session rows, '
+                          f'{eager_writes - lazy_writes} session writes')
+
+    def catalog_urls(self, count: int) -> list:
+        '''This function returns the pages of the crawl,
+        creating products first if the catalog is empty.'''
+        if not Product.objects.exists():
+            category = Category.objects.create(name='Benchmark')
+            Product.objects.bulk_create(
+                Product(name=f'Product {i}', price=10, category=category,
+                        image='uploads/product/benchmark.jpg')
+                for i in range(count))
+
+        urls = [reverse('home'), reverse('about'), reverse('category_summary')]
+        for category in Category.objects.all():
+            urls.append(reverse('category', args=[category.slug]))
+        for product_id in Product.objects.values_list('id', flat=True)[:count]:
+            urls.append(reverse('product', args=[product_id]))
+        return urls
+
+    def crawl(self, mode: str, urls: list, visitors: int) -> tuple:
+        '''This function visits every page with new visitors
+        and returns the number of session rows and session writes.'''
+        processors = ['django.template.context_processors.request',
+                      'django.contrib.auth.context_processors.auth',
+                      'django.contrib.messages.context_processors.messages']
+        if mode == 'eager':
+            processors.append('cart.management.commands.bench_cart_sessions.eager_cart')
+        else:
+            processors.append('cart.context_processor.cart')
+        templates = [{'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                      'APP_DIRS': True,
+                      'OPTIONS': {'context_processors': processors}}]
+
+        rows_before = Session.objects.count()
+        writes = 0
+        with override_settings(ALLOWED_HOSTS=['testserver'], TEMPLATES=templates):
+            for _ in range(visitors):
+                client = Client()
+                with CaptureQueriesContext(connection) as queries:
+                    for url in urls:
+                        client.get(url)
+                writes += sum(1 for query in queries.captured_queries
+                              if '"django_session"' in query['sql']
+                              and query['sql'].startswith(('INSERT', 'UPDATE')))
+
+        return Session.objects.count() - rows_before, writes
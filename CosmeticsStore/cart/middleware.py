@@ -0,0 +1,21 @@
+'''This module contains the middleware that saves the cart of a logged in user.'''
+from django.http import HttpRequest, HttpResponse
+
+from .store import save_cart
+
+
+class CartMiddleware:
+    '''This class saves the cart of a logged in user to the database
+    at the end of the request, but only if the cart was changed.
+    This way a request writes the cart at most once.'''
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+
+        if getattr(request, 'cart_changed', False) and request.user.is_authenticated:
+            save_cart(request.user, request.session.get('session_key', {}))
+
+        return response
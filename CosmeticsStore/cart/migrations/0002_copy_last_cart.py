@@ -0,0 +1,58 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:40
+
+import json
+
+from django.db import migrations
+
+
+def cart_items(last_cart) -> list:
+    '''Returns the (product id, quantity) pairs of a saved cart,
+    leaving out what is not a product id with a positive quantity.'''
+    if not isinstance(last_cart, dict):
+        return []
+    items = []
+    for key, value in last_cart.items():
+        if not str(key).isdigit():
+            continue
+        try:
+            quantity = int(value)
+        except (TypeError, ValueError):
+            continue
+        if quantity > 0:
+            items.append((int(key), quantity))
+    return items
+
+
+def copy_last_cart(apps, schema_editor):
+    '''Moves the carts saved as strings in Profile.last_cart to SavedCart.'''
+    Profile = apps.get_model('store', 'Profile')
+    Product = apps.get_model('store', 'Product')
+    SavedCart = apps.get_model('cart', 'SavedCart')
+    SavedCartItem = apps.get_model('cart', 'SavedCartItem')
+
+    product_ids = set(Product.objects.values_list('id', flat=True))
+    items = []
+    for profile in Profile.objects.exclude(last_cart__isnull=True).exclude(last_cart=''):
+        try:
+            last_cart = json.loads(profile.last_cart)
+        except ValueError:
+            # the old field was too short, so long carts were cut off
+            continue
+        if not isinstance(last_cart, dict):
+            continue
+        SavedCart.objects.get_or_create(user_id=profile.user_id)
+        items += [SavedCartItem(cart_id=profile.user_id, product_id=product_id, quantity=quantity)
+                  for product_id, quantity in cart_items(last_cart) if product_id in product_ids]
+    SavedCartItem.objects.bulk_create(items, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+        ('store', '0005_wishlist'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_last_cart, migrations.RunPython.noop),
+    ]
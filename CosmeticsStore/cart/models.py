@@ -1,3 +1,31 @@
+'''This module contains the models used to keep a customer's cart between visits.'''
 from django.db import models
+from django.contrib.auth.models import User
 
-# Create your models here.
+from store.models import Product
+
+
+class SavedCart(models.Model):
+    '''This class defines the saved cart of a registered user.
+    The user is the primary key so the lines can be written without looking the cart up.
+    The lines of the cart are kept in SavedCartItem.'''
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='saved_cart')
+
+    def __str__(self) -> str:
+        return f'Saved Cart - {self.user}'
+
+
+class SavedCartItem(models.Model):
+    '''This class defines one line (product and quantity) of a saved cart.'''
+    cart = models.ForeignKey(SavedCart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_saved_cart_product'),
+        ]
+
+    def __str__(self) -> str:
+        return f'Saved Cart Item - {str(self.id)}'
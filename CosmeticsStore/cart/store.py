@@ -0,0 +1,85 @@
+'''This module contains the functions that save and load
+the cart of a registered user from the database.'''
+from django.db import transaction
+
+from store.models import Product
+from .cart import Cart
+from .models import SavedCart, SavedCartItem
+
+
+def load_cart(user) -> dict:
+    '''This function returns the saved cart of the user
+    as a dictionary of product id (str) to quantity, like the session cart.'''
+    items = SavedCartItem.objects.filter(cart_id=user.id).values_list('product_id', 'quantity')
+    return {str(product_id): quantity for product_id, quantity in items}
+
+
+def save_cart(user, cart: dict) -> None:
+    '''This function writes the whole cart of the user to the database.
+    The lines still in the cart are upserted and all the other lines are removed,
+    so it is meant to be called once per request.'''
+    quantities = {int(key): int(value) for key, value in cart.items() if int(value) > 0}
+
+    with transaction.atomic():
+        SavedCart.objects.bulk_create([SavedCart(user_id=user.id)], ignore_conflicts=True)
+        # products removed from the store can still be in an old session
+        product_ids = list(Product.objects.filter(id__in=quantities).values_list('id', flat=True))
+        SavedCartItem.objects.filter(cart_id=user.id).exclude(product_id__in=product_ids).delete()
+        upsert_lines(user, {product_id: quantities[product_id] for product_id in product_ids})
+
+
+def upsert_lines(user, quantities: dict) -> None:
+    '''This function inserts or updates the given lines of the saved cart
+    with a single statement. The saved cart of the user must already exist.'''
+    SavedCartItem.objects.bulk_create(
+        [SavedCartItem(cart_id=user.id, product_id=int(product_id), quantity=quantity)
+         for product_id, quantity in quantities.items()],
+        update_conflicts=True,
+        unique_fields=['cart', 'product'],
+        update_fields=['quantity'],
+    )
+
+
+def clear_cart(user) -> None:
+    '''This function removes every line of the saved cart of the user.'''
+    SavedCartItem.objects.filter(cart_id=user.id).delete()
+
+
+def merge_carts(guest_cart: dict, saved_cart: dict) -> dict:
+    '''This function combines the cart made before logging in with the saved cart.
+    When a product is in both carts the larger quantity is kept,
+    so logging in again with the same cart doesn't double the quantities.'''
+    merged = dict(saved_cart)
+    for key, quantity in guest_cart.items():
+        merged[key] = max(int(quantity), merged.get(key, 0))
+    return merged
+
+
+def restore_cart(request, user) -> None:
+    '''This function is used when a customer logs in.
+    It merges the cart of the session with the saved cart of the user,
+    drops the products that no longer exist with one query
+    and saves the lines that changed with a single write.'''
+    cart = Cart(request)
+    saved_cart = load_cart(user)
+    merged = merge_carts(cart.cart, saved_cart)
+
+    # the saved lines point to existing products, only the guest ones must be checked
+    new_ids = [int(key) for key in merged if key not in saved_cart]
+    if new_ids:
+        existing = set(Product.objects.filter(id__in=new_ids).values_list('id', flat=True))
+        merged = {key: quantity for key, quantity in merged.items()
+                  if key in saved_cart or int(key) in existing}
+
+    changed_lines = {key: quantity for key, quantity in merged.items()
+                     if saved_cart.get(key) != quantity}
+    if changed_lines:
+        if not saved_cart:
+            SavedCart.objects.bulk_create([SavedCart(user_id=user.id)], ignore_conflicts=True)
+        upsert_lines(user, changed_lines)
+
+    if merged != cart.cart:
+        cart.cart.clear()
+        cart.cart.update(merged)
+        request.session['session_key'] = cart.cart
+        request.cart_snapshot = None
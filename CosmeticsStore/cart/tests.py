@@ -1,3 +1,120 @@
-from django.test import TestCase
+'''This module contains the tests of the cart.'''
+import json
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import TestCase, RequestFactory
+
+from store.models import Category, Product
+from .models import SavedCart, SavedCartItem
+from .store import load_cart, merge_carts, restore_cart
+
+
+class MergeCartsTest(TestCase):
+    '''This class tests how the guest cart is merged with the saved cart on login.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Serums')
+        cls.products = [
+            Product.objects.create(name=f'Product {i}', price=10, category=category,
+                                   image='uploads/product/test.jpg')
+            for i in range(3)]
+        cls.user = User.objects.create_user('customer', password='a-long-password')
+
+    def make_request(self, guest_cart: dict):
+        '''This function returns a request with the given cart in its session.'''
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        if guest_cart:
+            request.session['session_key'] = guest_cart
+        request.user = self.user
+        return request
+
+    def save(self, cart: dict):
+        '''This function saves the cart of the user in the database.'''
+        SavedCart.objects.create(user=self.user)
+        for key, quantity in cart.items():
+            SavedCartItem.objects.create(cart_id=self.user.id, product_id=int(key),
+                                         quantity=quantity)
+
+    def test_larger_quantity_is_kept(self):
+        merged = merge_carts({'1': 2, '2': 1}, {'1': 3, '3': 4})
+        self.assertEqual(merged, {'1': 3, '2': 1, '3': 4})
+
+    def test_merge_with_one_write(self):
+        first, second, third = (str(product.id) for product in self.products)
+        self.save({first: 1, second: 2})
+        request = self.make_request({first: 3, third: 1})
+
+        # load the saved cart, check the guest products, upsert the lines
+        with self.assertNumQueries(3):
+            restore_cart(request, self.user)
+
+        expected = {first: 3, second: 2, third: 1}
+        self.assertEqual(request.session['session_key'], expected)
+        self.assertEqual(load_cart(self.user), expected)
+
+    def test_removed_products_are_dropped(self):
+        first = str(self.products[0].id)
+        request = self.make_request({first: 2, '999': 1})
+
+        # load, check, create the saved cart, upsert the lines
+        with self.assertNumQueries(4):
+            restore_cart(request, self.user)
+
+        self.assertEqual(request.session['session_key'], {first: 2})
+        self.assertEqual(load_cart(self.user), {first: 2})
+
+    def test_no_guest_cart_only_reads(self):
+        first = str(self.products[0].id)
+        self.save({first: 5})
+        request = self.make_request({})
+
+        with self.assertNumQueries(1):
+            restore_cart(request, self.user)
+
+        self.assertEqual(request.session['session_key'], {first: 5})
+
+    def test_login_restores_saved_cart(self):
+        first, second = (str(product.id) for product in self.products[:2])
+        self.save({first: 2})
+        self.client.post('/cart/add/', {'action': 'post', 'product_id': second,
+                                        'product_qty': 1})
+
+        self.client.post('/login/', {'username': 'customer', 'password': 'a-long-password'})
+
+        self.assertEqual(self.client.session['session_key'], {first: 2, second: 1})
+        self.assertEqual(load_cart(self.user), {first: 2, second: 1})
+
+
+class CartBatchTest(TestCase):
+    '''This class tests the endpoint that changes several products of the cart at once.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Serums')
+        cls.products = [
+            Product.objects.create(name=f'Product {i}', price=10, category=category,
+                                   image='uploads/product/test.jpg')
+            for i in range(2)]
+
+    def batch(self, operations):
+        '''This function sends the operations to the endpoint.'''
+        return self.client.post('/cart/batch/', json.dumps({'operations': operations}),
+                                content_type='application/json')
+
+    def test_operations_are_applied(self):
+        first, second = self.products
+        response = self.batch([{'action': 'add', 'product_id': first.id, 'product_qty': 2},
+                               {'action': 'add', 'product_id': second.id, 'product_qty': 1},
+                               {'action': 'delete', 'product_id': second.id}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.session['session_key'], {str(first.id): 2})
+
+    def test_invalid_operations_leave_the_cart(self):
+        self.assertEqual(self.batch(['add', 1]).status_code, 400)
+        self.assertEqual(self.batch([{'action': 'buy', 'product_id': 1}]).status_code, 400)
+        self.assertEqual(self.batch([{'action': 'add', 'product_id': 999,
+                                      'product_qty': 1}]).status_code, 404)
+        self.assertNotIn('session_key', self.client.session)
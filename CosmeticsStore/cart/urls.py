@@ -7,4 +7,5 @@ urlpatterns = [
     path('add/', views.cart_add, name='cart_add'),
     path('delete/', views.cart_delete, name='cart_delete'),
     path('update/', views.cart_update, name='cart_update'),
+    path('batch/', views.cart_batch, name='cart_batch'),
     ]
@@ -2,10 +2,12 @@
 This module contains the functions needed when
 a certain button from the cart page is clicked.
 '''
-from django.shortcuts import render, get_object_or_404
+import json
+
+from django.shortcuts import render
 from django.http import JsonResponse
-from django.contrib import messages
 from django.http import HttpRequest, HttpResponse
+from django.views.decorators.http import require_POST
 
 from store.models import Product
 from .cart import Cart
@@ -14,51 +16,61 @@ from .cart import Cart
 def cart_summary(request: HttpRequest) -> HttpResponse:
     '''This function is used when we click on the cart button
     and it shows everything in the cart.'''
-    cart = Cart(request)
-    cart_products = cart.get_products
-    quantities = cart.get_quantities
-    totals = cart.cart_total()
+    snapshot = Cart(request).snapshot()
     return render(request, 'cart_summary.html',
-                  {"cart_products":cart_products, "quantities":quantities, "totals":totals})
+                  {"cart_lines":snapshot.lines, "totals":snapshot.total})
+
+def apply_cart_operations(request: HttpRequest, operations: list) -> JsonResponse:
+    '''This function applies the operations to the cart
+    and returns the new lines, number of lines and total of the cart.'''
+    try:
+        snapshot = Cart(request).apply(operations)
+    except Product.DoesNotExist as error:
+        return JsonResponse({'error': str(error)}, status=404)
+    except (KeyError, TypeError, ValueError) as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return JsonResponse(snapshot.as_dict())
+
+@require_POST
+def cart_batch(request: HttpRequest) -> JsonResponse:
+    '''This function is used to change several products of the cart with one request.
+    The body is JSON: {"operations": [{"action": "add", "product_id": 1, "product_qty": 2}, ...]}
+    where action is add, update or delete.'''
+    try:
+        operations = json.loads(request.body)['operations']
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({'error': 'The body must be JSON with a list of operations.'},
+                            status=400)
+    if not isinstance(operations, list):
+        return JsonResponse({'error': 'The operations must be a list.'}, status=400)
+
+    return apply_cart_operations(request, operations)
 
 def cart_add(request: HttpRequest) -> HttpResponse|None:
     '''This function is used when we add products in the cart.'''
-    cart = Cart(request)
     if request.POST.get('action') == 'post':
-        product_id = int(request.POST.get('product_id'))
-        product_qty = int(request.POST.get('product_qty'))
-        product = get_object_or_404(Product, id = product_id)
-        cart.add(product=product, quantity=product_qty)
-
-        cart_quantity = cart.__len__()
-
-        response = JsonResponse({'quantity: ': cart_quantity})
-        messages.success(request, ("Product Added To Cart Successfully!"))
-        return response
+        return apply_cart_operations(request, [{
+            'action': 'add',
+            'product_id': request.POST.get('product_id'),
+            'product_qty': request.POST.get('product_qty'),
+        }])
 
 
 def cart_delete(request: HttpRequest) -> HttpResponse|None:
     '''This function is used when we delete products from the cart.'''
-    cart = Cart(request)
     if request.POST.get('action') == 'post':
-        product_id = int(request.POST.get('product_id'))
-        cart.delete(product=product_id)
-        response = JsonResponse({'product':product_id})
-        messages.success(request, ("Product Has Been Removed From Cart!"))
-
-        return response
+        return apply_cart_operations(request, [{
+            'action': 'delete',
+            'product_id': request.POST.get('product_id'),
+        }])
 
 def cart_update(request: HttpRequest) -> HttpResponse|None:
     '''This function is used to update the cart
     after changing quantity of a product.'''
-    cart = Cart(request)
     if request.POST.get('action') == 'post':
-        product_id = int(request.POST.get('product_id'))
-        product_qty = int(request.POST.get('product_qty'))
-
-        cart.update(product=product_id, quantity=product_qty)
-
-        response = JsonResponse({'quantity':product_qty})
-        messages.success(request, ("Your Cart Has Been Updated!"))
-
-        return response
+        return apply_cart_operations(request, [{
+            'action': 'update',
+            'product_id': request.POST.get('product_id'),
+            'product_qty': request.POST.get('product_qty'),
+        }])
@@ -6,3 +6,6 @@ class PaymentConfig(AppConfig):
     '''Configuration class for the Payment app.'''
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payment'
+
+    def ready(self) -> None:
+        from . import signals # pylint: disable=import-outside-toplevel,unused-import
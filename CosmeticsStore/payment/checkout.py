@@ -0,0 +1,63 @@
+'''This module contains the state of a checkout: the shipping info the customer
+gave between the checkout and the payment.
+Only the validated fields of the ShippingForm are kept, as a short signed value
+in the session. It has the time it was signed, so it expires after CHECKOUT_TTL seconds.'''
+from django.conf import settings
+from django.core import signing
+from django.http import HttpRequest
+
+SESSION_KEY = 'checkout'
+SALT = 'payment.checkout'
+FIELDS = ('shipping_full_name', 'shipping_email', 'shipping_address1', 'shipping_address2',
+          'shipping_city', 'shipping_zipcode', 'shipping_country')
+
+
+class CheckoutState():
+    '''This class holds the validated shipping fields of one checkout.'''
+    __slots__ = FIELDS
+
+    def __init__(self, values: tuple) -> None:
+        for name, value in zip(FIELDS, values):
+            setattr(self, name, value or '')
+
+    @classmethod
+    def from_form(cls, form) -> 'CheckoutState':
+        '''This function makes the state from a valid ShippingForm.'''
+        return cls(tuple(form.cleaned_data.get(name) for name in FIELDS))
+
+    def values(self) -> tuple:
+        '''This function returns the fields in the order of FIELDS, the way they are kept.'''
+        return tuple(getattr(self, name) for name in FIELDS)
+
+    def as_dict(self) -> dict:
+        '''This function returns the fields, to fill the ShippingForm again.'''
+        return dict(zip(FIELDS, self.values()))
+
+    @property
+    def shipping_address(self) -> str:
+        '''This function returns the address the way it is saved in the order.'''
+        return '\n'.join((self.shipping_address1, self.shipping_address2, self.shipping_city,
+                          self.shipping_zipcode, self.shipping_country))
+
+
+def save_state(request: HttpRequest, state: CheckoutState) -> None:
+    '''This function keeps the state of the checkout in the session.'''
+    request.session[SESSION_KEY] = signing.dumps(state.values(), salt=SALT)
+
+
+def load_state(request: HttpRequest) -> CheckoutState|None:
+    '''This function returns the state of the checkout,
+    or None if there is none or it has expired.'''
+    token = request.session.get(SESSION_KEY)
+    if token is None:
+        return None
+    try:
+        values = signing.loads(token, salt=SALT, max_age=settings.CHECKOUT_TTL)
+    except signing.BadSignature:
+        return None
+    return CheckoutState(values)
+
+
+def clear_state(request: HttpRequest) -> None:
+    '''This function forgets the state of the checkout after the order is placed.'''
+    request.session.pop(SESSION_KEY, None)
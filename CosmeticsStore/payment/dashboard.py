@@ -0,0 +1,70 @@
+'''This module contains what the order dashboards need:
+the filters, the pages and the number of orders of each shipping status.
+The numbers are counted with one query and kept in the cache until an order changes.'''
+import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.http import QueryDict
+from django.utils import timezone
+
+from store.pagination import paginate_newest
+from .forms import OrderFilterForm
+from .models import Order
+
+COUNTS_KEY = 'order_counts'
+PAGE_SIZE = 50
+
+
+def order_counts() -> dict:
+    '''This function returns the number of shipped and not shipped orders.'''
+    counts = cache.get(COUNTS_KEY)
+    if counts is None:
+        counts = {'shipped': 0, 'not_shipped': 0}
+        for shipped, count in (Order.objects.order_by().values_list('shipped')
+                               .annotate(count=Count('id'))):
+            counts['shipped' if shipped else 'not_shipped'] = count
+        cache.set(COUNTS_KEY, counts, None)
+    return counts
+
+
+def orders_changed() -> None:
+    '''This function counts the orders again the next time they are needed.'''
+    cache.delete(COUNTS_KEY)
+
+
+def order_saved(sender, instance: Order, **kwargs) -> None:
+    '''This function forgets the counts when an order is placed, changed or deleted.'''
+    transaction.on_commit(orders_changed)
+
+
+def _start_of(date: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(date, datetime.time.min,
+                                     tzinfo=timezone.get_current_timezone())
+
+
+def filter_orders(queryset, form: OrderFilterForm):
+    '''This function keeps the orders matching the email and the dates of a valid filter form.
+    The dates are compared as a range, so the index on the date can be used.'''
+    email = form.cleaned_data.get('email')
+    date_from = form.cleaned_data.get('date_from')
+    date_to = form.cleaned_data.get('date_to')
+    if email:
+        queryset = queryset.filter(email__icontains=email)
+    if date_from:
+        queryset = queryset.filter(date_ordered__gte=_start_of(date_from))
+    if date_to:
+        queryset = queryset.filter(
+            date_ordered__lt=_start_of(date_to + datetime.timedelta(days=1)))
+    return queryset
+
+
+def dashboard_page(shipped: bool, params: QueryDict) -> tuple:
+    '''This function returns the filter form and the page of the orders
+    with the given shipping status, newest first.'''
+    form = OrderFilterForm(params)
+    queryset = Order.objects.filter(shipped=shipped)
+    if form.is_valid():
+        queryset = filter_orders(queryset, form)
+    return form, paginate_newest(queryset, params, 'date_ordered', PAGE_SIZE)
@@ -0,0 +1,39 @@
+'''This module loads an order with its items for the order pages.
+The order is read with one query and its items, with their products,
+with a second one, however many items the order has.'''
+from django.db.models import Prefetch
+
+from .models import Order, OrderItem
+
+
+class OrderLine():
+    '''This class defines one line of an order:
+    the item, the name of its product and the price of the line.'''
+
+    def __init__(self, item: OrderItem) -> None:
+        self.item = item
+        self.name = item.product.name if item.product else 'Removed product'
+        self.quantity = item.quantity
+        self.price = item.price
+        self.total = item.price * item.quantity
+
+
+class OrderDetail():
+    '''This class contains an order, its lines and their total, computed once.'''
+
+    def __init__(self, order: Order) -> None:
+        self.order = order
+        self.lines = [OrderLine(item) for item in order.orderitem_set.all()]
+        self.total = sum((line.total for line in self.lines), 0)
+
+
+def load_order(pk: int, user=None) -> OrderDetail|None:
+    '''This function returns the order with the given id, or None if there is none.
+    When a user is given, only an order of that user is returned.'''
+    orders = Order.objects.filter(id=pk)
+    if user is not None:
+        orders = orders.filter(user=user)
+    order = orders.prefetch_related(
+        Prefetch('orderitem_set',
+                 queryset=OrderItem.objects.select_related('product').order_by('id'))).first()
+    return OrderDetail(order) if order else None
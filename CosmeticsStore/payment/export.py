@@ -0,0 +1,121 @@
+'''This module exports the orders with their items as CSV or as JSON lines.
+The orders are read with .iterator(chunk_size), which also reads the items
+(with their products) of each chunk of orders with one query, and the text
+is made a chunk at a time, so the memory needed doesn't grow with the number of orders.'''
+import csv
+import json
+
+from django.db.models import Prefetch
+from django.http import QueryDict
+
+from .dashboard import filter_orders
+from .forms import OrderFilterForm
+from .models import Order, OrderItem
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+ORDER_COLUMNS = ['order_id', 'date_ordered', 'full_name', 'email', 'shipping_address',
+                 'amount_paid', 'shipped', 'date_shipped']
+ITEM_COLUMNS = ['product_id', 'product_name', 'quantity', 'price']
+# a cell starting with one of these is run as a formula by spreadsheet programs
+FORMULA_STARTS = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Lines():
+    '''This class collects what the csv writer writes, so it can be returned as text.'''
+
+    def __init__(self) -> None:
+        self.parts = []
+
+    def write(self, text: str) -> None:
+        self.parts.append(text)
+
+    def pop(self) -> str:
+        text = ''.join(self.parts)
+        self.parts = []
+        return text
+
+
+def export_orders(params: QueryDict|dict):
+    '''This function returns the orders matching the filters
+    (email, date_from, date_to and shipped, 'true' or 'false'), oldest first,
+    with the items of each chunk prefetched. Invalid filters are left out.'''
+    orders = Order.objects.all()
+    form = OrderFilterForm(params)
+    if form.is_valid():
+        orders = filter_orders(orders, form)
+    shipped = params.get('shipped')
+    if shipped in ('true', 'false'):
+        orders = orders.filter(shipped=shipped == 'true')
+    items = OrderItem.objects.select_related('product').only(
+        'order', 'product__name', 'quantity', 'price').order_by('id')
+    return orders.order_by('id').prefetch_related(Prefetch('orderitem_set', queryset=items))
+
+
+def _chunks(orders, chunk_size: int):
+    chunk = []
+    for order in orders.iterator(chunk_size=chunk_size):
+        chunk.append(order)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _order_values(order: Order) -> list:
+    return [order.id, order.date_ordered.isoformat(), order.full_name, order.email,
+            order.shipping_address, str(order.amount_paid), order.shipped,
+            order.date_shipped.isoformat() if order.date_shipped else '']
+
+
+def _item_values(item: OrderItem) -> list:
+    return [item.product_id, item.product.name if item.product else '',
+            item.quantity, str(item.price)]
+
+
+def _csv_row(values: list) -> list:
+    '''This function puts a quote before the text cells that would be read as a formula,
+    since names and addresses are written by the customers.'''
+    return ["'" + value if isinstance(value, str) and value.startswith(FORMULA_STARTS)
+            else value for value in values]
+
+
+def csv_lines(orders, chunk_size: int = CHUNK_SIZE):
+    '''This generator returns the header and then the text of a chunk of orders at a time,
+    one row per item. An order without items has one row with empty item columns.'''
+    lines = _Lines()
+    writer = csv.writer(lines)
+    writer.writerow(ORDER_COLUMNS + ITEM_COLUMNS)
+    yield lines.pop()
+    for chunk in _chunks(orders, chunk_size):
+        for order in chunk:
+            values = _order_values(order)
+            items = order.orderitem_set.all()
+            if not items:
+                writer.writerow(_csv_row(values + [''] * len(ITEM_COLUMNS)))
+            for item in items:
+                writer.writerow(_csv_row(values + _item_values(item)))
+        yield lines.pop()
+
+
+def jsonl_lines(orders, chunk_size: int = CHUNK_SIZE):
+    '''This generator returns the text of a chunk of orders at a time,
+    one JSON object per order with its items in a list.'''
+    for chunk in _chunks(orders, chunk_size):
+        lines = []
+        for order in chunk:
+            row = dict(zip(ORDER_COLUMNS, _order_values(order)))
+            row['date_shipped'] = row['date_shipped'] or None
+            row['items'] = [dict(zip(ITEM_COLUMNS, _item_values(item)))
+                            for item in order.orderitem_set.all()]
+            lines.append(json.dumps(row, ensure_ascii=False) + '\n')
+        yield ''.join(lines)
+
+
+def export_lines(orders, export_format: str, chunk_size: int = CHUNK_SIZE):
+    '''This function returns the generator of the text of the export in the given format.'''
+    if export_format == 'csv':
+        return csv_lines(orders, chunk_size)
+    return jsonl_lines(orders, chunk_size)
@@ -61,3 +61,19 @@ class PaymentForm(forms.Form):
         label="",
         widget=forms.TextInput(attrs={'class':'form-control', 'placeholder':'CVV Code'}),
         required=True)
+
+
+class OrderFilterForm(forms.Form):
+    '''This class contains the filters of the order dashboards.'''
+    email = forms.CharField(
+        label="",
+        widget=forms.TextInput(attrs={'class':'form-control', 'placeholder':'Customer Email'}),
+        required=False)
+    date_from = forms.DateField(
+        label="From",
+        widget=forms.DateInput(attrs={'class':'form-control', 'type':'date'}),
+        required=False)
+    date_to = forms.DateField(
+        label="To",
+        widget=forms.DateInput(attrs={'class':'form-control', 'type':'date'}),
+        required=False)
@@ -0,0 +1,85 @@
+'''This module contains a benchmark of exporting many orders.'''
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from payment.export import CHUNK_SIZE, export_lines, export_orders
+from payment.models import Order, OrderItem
+from store.models import Category, Product
+
+
+def peak_mb() -> float:
+    '''This function returns the most memory allocated by Python since tracemalloc
+    was started, in MB. It works the same on every operating system.'''
+    return tracemalloc.get_traced_memory()[1] / 2**20
+
+
+def naive_lines(orders):
+    '''This generator loads every order and item before writing a line, like
+    list(Order.objects.all()) would, to compare with the streaming export.'''
+    rows = [(order, list(order.orderitem_set.all())) for order in orders]
+    for order, items in rows:
+        for item in items:
+            yield f'{order.id},{item.product_id},{item.quantity}\n'
+
+
+class Command(BaseCommand):
+    '''This class creates the given number of order items, exports them as CSV
+    and as JSON lines, then loads them all at once, and prints the rows per second
+    and the peak memory allocated by each. Everything is rolled back at the end.
+    The memory is traced with tracemalloc, which slows Python down a lot,
+    so every way is run a second time to measure it.'''
+    help = 'Measures the speed and the memory of exporting the orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1_000_000)
+        parser.add_argument('--items-per-order', type=int, default=5)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--skip-naive', action='store_true')
+
+    def handle(self, *args, **options):
+        per_order = options['items_per_order']
+        count = options['items'] // per_order
+        with transaction.atomic():
+            started = time.perf_counter()
+            category = Category.objects.create(name='Benchmark Export')
+            products = Product.objects.bulk_create(
+                Product(name=f'Product {i}', price=10, category=category,
+                        image='uploads/product/benchmark.jpg')
+                for i in range(100))
+            batch = 10_000
+            for start in range(0, count, batch):
+                orders = Order.objects.bulk_create(
+                    Order(full_name=f'Customer {i}', email=f'customer{i}@example.com',
+                          shipping_address='1 Vitosha Blvd\nSofia', amount_paid=10 * per_order)
+                    for i in range(start, min(start + batch, count)))
+                OrderItem.objects.bulk_create(
+                    OrderItem(order=order, product=products[(order.id + j) % len(products)],
+                              quantity=1, price=10)
+                    for order in orders for j in range(per_order))
+            self.stdout.write(f'{count} orders with {count * per_order} items created '
+                              f'in {time.perf_counter() - started:.1f}s')
+            self.stdout.write('way'.ljust(12) + 'rows/s'.rjust(12) + 'seconds'.rjust(10)
+                              + 'MB'.rjust(10) + 'peak MB'.rjust(10))
+
+            ways = [
+                ('csv', lambda: export_lines(export_orders({}), 'csv', options['chunk_size'])),
+                ('jsonl', lambda: export_lines(export_orders({}), 'jsonl', options['chunk_size'])),
+            ]
+            if not options['skip_naive']:
+                ways.append(('everything', lambda: naive_lines(
+                    Order.objects.prefetch_related('orderitem_set').order_by('id'))))
+            for name, lines in ways:
+                started = time.perf_counter()
+                size = sum(len(text) for text in lines())
+                seconds = time.perf_counter() - started
+                tracemalloc.start()
+                for _ in lines():
+                    pass
+                self.stdout.write(name.ljust(12) + f'{count * per_order / seconds:12.0f}'
+                                  + f'{seconds:10.1f}' + f'{size / 2**20:10.0f}'
+                                  + f'{peak_mb():10.0f}')
+                tracemalloc.stop()
+            transaction.set_rollback(True)
@@ -0,0 +1,30 @@
+'''This module contains the command that exports the orders with their items.'''
+from django.core.management.base import BaseCommand
+
+from payment.export import CHUNK_SIZE, FORMATS, export_lines, export_orders
+
+
+class Command(BaseCommand):
+    '''This class writes the orders matching the filters, with their items,
+    as CSV or JSON lines, a chunk of orders at a time.'''
+    help = 'Exports the orders with their items as CSV or JSON lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help='The file to write, the standard output if not given.')
+        parser.add_argument('--email', default='')
+        parser.add_argument('--date-from', default='', help='YYYY-MM-DD')
+        parser.add_argument('--date-to', default='', help='YYYY-MM-DD')
+        parser.add_argument('--shipped', choices=('true', 'false'), default='')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        orders = export_orders({'email': options['email'], 'date_from': options['date_from'],
+                                'date_to': options['date_to'], 'shipped': options['shipped']})
+        lines = export_lines(orders, options['format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
+        else:
+            for text in lines:
+                self.stdout.write(text, ending='')
@@ -0,0 +1,19 @@
+'''This module contains the command that counts the sales tables again.'''
+from django.core.management.base import BaseCommand
+
+from payment import sales
+
+
+class Command(BaseCommand):
+    '''This class counts the daily, product and category sales again from all the orders.
+    It is needed once for the orders placed before the sales tables
+    and after orders are changed or deleted in the admin.'''
+    help = 'Counts the sales tables again from all the orders, a chunk at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=sales.REBUILD_CHUNK_SIZE,
+                            help='How many orders or items are read at a time.')
+
+    def handle(self, *args, **options):
+        sales.rebuild(options['chunk_size'])
+        self.stdout.write('Sales tables rebuilt.')
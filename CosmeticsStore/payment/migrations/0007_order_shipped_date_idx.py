@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0006_order_date_shipped'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shipped', 'date_ordered'], name='order_shipped_date_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0008_order_user_date_idx'),
+        ('store', '0012_product_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorySales',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='store.category')),
+                ('units', models.PositiveIntegerField(db_default=0)),
+                ('revenue', models.DecimalField(db_default=0, decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'Category Sales',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('orders', models.PositiveIntegerField(db_default=0)),
+                ('shipped', models.IntegerField(db_default=0)),
+                ('units', models.PositiveIntegerField(db_default=0)),
+                ('revenue', models.DecimalField(db_default=0, decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Sales',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='store.product')),
+                ('units', models.PositiveIntegerField(db_default=0)),
+                ('revenue', models.DecimalField(db_default=0, db_index=True, decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'Product Sales',
+            },
+        ),
+    ]
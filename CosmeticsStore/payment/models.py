@@ -1,11 +1,10 @@
 '''This module contains the models for the Payment app.'''
-import datetime
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save, pre_save
-from django.dispatch import receiver
+from django.db.models.signals import post_save
+from django.utils import timezone
 
-from store.models import Product
+from store.models import Category, Product
 
 class ShippingAddress(models.Model):
     '''This class defines the fields we need for the shipping address.'''
@@ -36,8 +35,41 @@ def create_shipping_address(sender, instance, created: bool, **kwargs):
 post_save.connect(create_shipping_address, sender = User)
 
 
+class OrderQuerySet(models.QuerySet):
+    '''This class adds the shipping status change to the order querysets.'''
+
+    def set_shipped(self, shipped: bool) -> int:
+        '''This function marks the orders as shipped or not shipped with one UPDATE.
+        Only the orders whose status changes are written, and the ones that become
+        shipped get the date of now, the same way Order.save does it.
+        The shipped orders of the daily sales change in the same transaction.'''
+        # pylint: disable-next=import-outside-toplevel
+        from . import dashboard, sales
+        with transaction.atomic():
+            # the orders that change, locked until the end of the transaction
+            changing = list(self.filter(shipped=not shipped).select_for_update()
+                            .values_list('id', 'date_ordered'))
+            if not changing:
+                return 0
+            orders = self.model.objects.filter(id__in=[order_id for order_id, _ in changing])
+            if shipped:
+                orders.update(shipped=True, date_shipped=timezone.now())
+            else:
+                orders.update(shipped=False)
+
+            days = {}
+            for _, date_ordered in changing:
+                day = timezone.localdate(date_ordered)
+                days[day] = days.get(day, 0) + (1 if shipped else -1)
+            sales.record_shipping(days)
+            transaction.on_commit(dashboard.orders_changed)
+        return len(changing)
+
+
 class Order(models.Model):
-    '''This class defines what the order consists of.'''
+    '''This class defines what the order consists of.
+    The values loaded from the database are remembered, so a save
+    writes only the changed fields and knows if the order was just shipped.'''
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank = True)
     full_name = models.CharField(max_length=250)
     email = models.EmailField(max_length=250)
@@ -47,18 +79,81 @@ class Order(models.Model):
     shipped = models.BooleanField(default=False)
     date_shipped = models.DateTimeField(blank=True, null=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shipped', 'date_ordered'], name='order_shipped_date_idx'),
+            models.Index(fields=['user', 'date_ordered'], name='order_user_date_idx'),
+        ]
+
     def __str__(self) -> str:
         return f'Order - {str(self.id)}'
 
-@receiver(pre_save, sender = Order)
-def set_shipped_date(sender, instance, **kwargs):
-    '''This function sets the shipped date of an order
-    automatically after being shipped.'''
-    if instance.pk:
-        now = datetime.datetime.now()
-        object1 = sender._default_manager.get(pk=instance.pk) # object is protected
-        if instance.shipped and not object1.shipped:
-            instance.date_shipped = now
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded = {name: value for name, value in zip(field_names, values)
+                            if value is not models.DEFERRED}
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None) -> None:
+        '''This function reads the order again and takes the new values as the loaded ones,
+        so a save after it only writes what was changed since.'''
+        super().refresh_from_db(using, fields, from_queryset)
+        current = self._current()
+        if fields is None:
+            self._loaded = current
+        else:
+            attnames = {self._meta.get_field(name).attname for name in fields}
+            self._loaded = {**getattr(self, '_loaded', {}),
+                            **{name: value for name, value in current.items()
+                               if name in attnames}}
+
+    def _current(self) -> dict:
+        deferred = self.get_deferred_fields()
+        return {field.attname: getattr(self, field.attname)
+                for field in self._meta.concrete_fields if field.attname not in deferred}
+
+    def changed_fields(self) -> list:
+        '''This function returns the fields changed since the order was loaded.'''
+        loaded = getattr(self, '_loaded', {})
+        return [name for name, value in self._current().items()
+                if name in loaded and loaded[name] != value]
+
+    def was_shipped(self) -> bool|None:
+        '''This function tells if the order was shipped when it was loaded.'''
+        loaded = getattr(self, '_loaded', {})
+        if 'shipped' in loaded:
+            return loaded['shipped']
+        # the order was not loaded with its status, so it has to be read
+        return Order.objects.filter(pk=self.pk).values_list('shipped', flat=True).first()
+
+    def save(self, *args, **kwargs) -> None:
+        shipping_change = 0
+        if not self._state.adding:
+            was_shipped = self.was_shipped()
+            if was_shipped is not None and was_shipped != self.shipped:
+                shipping_change = 1 if self.shipped else -1
+            # set the shipped date automatically after being shipped
+            if self.shipped and not was_shipped:
+                self.date_shipped = timezone.now()
+
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None and not args and hasattr(self, '_loaded'):
+                # an empty list saves nothing
+                kwargs['update_fields'] = self.changed_fields()
+            elif update_fields is not None and 'shipped' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'date_shipped'}
+
+        if shipping_change:
+            from . import sales # pylint: disable=import-outside-toplevel
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                sales.record_shipping({timezone.localdate(self.date_ordered): shipping_change})
+        else:
+            super().save(*args, **kwargs)
+        self._loaded = self._current()
 
 
 class OrderItem(models.Model):
@@ -72,3 +167,51 @@ class OrderItem(models.Model):
 
     def __str__(self) -> str:
         return f'Order Item - {str(self.id)}'
+
+
+class DailySales(models.Model):
+    '''This class defines the sales of one day: the orders placed that day,
+    how many of them are shipped, the units sold and the revenue.
+    Like the other sales tables it is kept up to date by payment.sales
+    when an order is placed or shipped, so the reports never read the orders.'''
+    day = models.DateField(primary_key=True)
+    orders = models.PositiveIntegerField(db_default=0)
+    # it can go below 0 until the tables are rebuilt, when orders placed
+    # before them are marked as not shipped
+    shipped = models.IntegerField(db_default=0)
+    units = models.PositiveIntegerField(db_default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, db_default=0)
+
+    class Meta:
+        verbose_name_plural = "Daily Sales"
+
+    def __str__(self) -> str:
+        return f'Daily Sales - {self.day}'
+
+
+class ProductSales(models.Model):
+    '''This class defines the units sold and the revenue of one product.'''
+    product = models.OneToOneField(Product, on_delete=models.CASCADE,
+                                   primary_key=True, related_name='sales')
+    units = models.PositiveIntegerField(db_default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, db_default=0, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "Product Sales"
+
+    def __str__(self) -> str:
+        return f'Product Sales - {self.product_id}'
+
+
+class CategorySales(models.Model):
+    '''This class defines the units sold and the revenue of one category.'''
+    category = models.OneToOneField(Category, on_delete=models.CASCADE,
+                                    primary_key=True, related_name='sales')
+    units = models.PositiveIntegerField(db_default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, db_default=0)
+
+    class Meta:
+        verbose_name_plural = "Category Sales"
+
+    def __str__(self) -> str:
+        return f'Category Sales - {self.category_id}'
@@ -0,0 +1,106 @@
+'''This module keeps the sales tables (DailySales, ProductSales, CategorySales)
+up to date, so the sales report never reads the orders.
+The totals are added with one INSERT ... ON CONFLICT DO UPDATE per table,
+in the transaction that places or ships the order.
+Orders added, changed or deleted in the admin are only counted
+after the tables are rebuilt with the rebuild_sales command.'''
+import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CategorySales, DailySales, Order, OrderItem, ProductSales
+
+# rows written by one INSERT, so the statement stays under the parameter limit of SQLite
+BATCH_SIZE = 100
+REBUILD_CHUNK_SIZE = 5000
+
+
+def _add(model, columns: tuple, totals: dict) -> None:
+    '''This function adds the totals (primary key to a tuple of numbers, in the order
+    of columns) to the rows of the table, creating the rows that are missing.'''
+    table = model._meta.db_table
+    key = model._meta.pk.column
+    names = ', '.join((key,) + columns)
+    row = '(' + ', '.join(['%s'] * (len(columns) + 1)) + ')'
+    updates = ', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in columns)
+    items = list(totals.items())
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), BATCH_SIZE):
+            batch = items[start:start + BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {table} ({names}) VALUES {", ".join([row] * len(batch))} '
+                f'ON CONFLICT ({key}) DO UPDATE SET {updates}',
+                [value for pk, values in batch for value in (pk, *values)])
+
+
+def _day(pk: datetime.date):
+    return connection.ops.adapt_datefield_value(pk)
+
+
+def _sum(totals: dict, pk, *values) -> None:
+    old = totals.get(pk)
+    totals[pk] = values if old is None else tuple(a + b for a, b in zip(old, values))
+
+
+def record_order(order: Order, cart_lines) -> None:
+    '''This function adds a new order and its priced lines to the sales tables.
+    It must run in the transaction of the order.'''
+    units = sum(line.quantity for line in cart_lines)
+    products, categories = {}, {}
+    for line in cart_lines:
+        _sum(products, line.product.id, line.quantity, line.total)
+        _sum(categories, line.product.category_id, line.quantity, line.total)
+
+    _add(DailySales, ('orders', 'units', 'revenue'),
+         {_day(timezone.localdate(order.date_ordered)): (1, units, order.amount_paid)})
+    _add(ProductSales, ('units', 'revenue'), products)
+    _add(CategorySales, ('units', 'revenue'), categories)
+
+
+def record_shipping(days: dict) -> None:
+    '''This function adds the change of the shipped orders of each day
+    (day the orders were placed to +n or -n) to the daily sales.'''
+    _add(DailySales, ('shipped',),
+         {_day(day): (change,) for day, change in days.items() if change})
+
+
+def _chunks(queryset, fields: tuple, chunk_size: int):
+    '''This function reads the rows of the queryset in chunks ordered by id,
+    each chunk starting after the id of the last one.'''
+    last = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last).order_by('id')
+                    .values_list('id', *fields)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+@transaction.atomic
+def rebuild(chunk_size: int = REBUILD_CHUNK_SIZE) -> None:
+    '''This function counts the sales tables again from all the orders.
+    The orders and their items are read a chunk at a time,
+    so the memory needed doesn't grow with the number of orders.'''
+    for model in (DailySales, ProductSales, CategorySales):
+        model.objects.all().delete()
+
+    for rows in _chunks(Order.objects.all(), ('date_ordered', 'shipped', 'amount_paid'),
+                        chunk_size):
+        days = {}
+        for _, date_ordered, shipped, amount_paid in rows:
+            _sum(days, _day(timezone.localdate(date_ordered)), 1, int(shipped), amount_paid)
+        _add(DailySales, ('orders', 'shipped', 'revenue'), days)
+
+    fields = ('order__date_ordered', 'product_id', 'product__category_id', 'quantity', 'price')
+    for rows in _chunks(OrderItem.objects.filter(order__isnull=False, product__isnull=False),
+                        fields, chunk_size):
+        days, products, categories = {}, {}, {}
+        for _, date_ordered, product_id, category_id, quantity, price in rows:
+            _sum(days, _day(timezone.localdate(date_ordered)), quantity)
+            _sum(products, product_id, quantity, price * quantity)
+            _sum(categories, category_id, quantity, price * quantity)
+        _add(DailySales, ('units',), days)
+        _add(ProductSales, ('units', 'revenue'), products)
+        _add(CategorySales, ('units', 'revenue'), categories)
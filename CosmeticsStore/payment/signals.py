@@ -0,0 +1,10 @@
+'''This module connects the functions that keep the caches
+of the payment app up to date when the orders change.'''
+from django.db.models.signals import post_save, post_delete
+
+from . import dashboard
+from .models import Order
+
+
+post_save.connect(dashboard.order_saved, sender = Order)
+post_delete.connect(dashboard.order_saved, sender = Order)
@@ -1,3 +1,447 @@
-from django.test import TestCase
+'''This module contains the tests of the payment app.'''
+import json
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from cart.models import SavedCart, SavedCartItem
+from store.inventory import OutOfStock, reserve_stock, sold_out_ids
+from store.models import Category, Product
+from . import sales
+from .checkout import SALT, SESSION_KEY
+from .details import load_order
+from .export import export_lines, export_orders
+from .models import CategorySales, DailySales, Order, OrderItem, ProductSales
+
+SHIPPING = {
+    'shipping_full_name': 'Ana Petrova', 'shipping_email': 'ana@example.com',
+    'shipping_address1': '1 Vitosha Blvd', 'shipping_address2': '',
+    'shipping_city': 'Sofia', 'shipping_zipcode': '1000', 'shipping_country': 'Bulgaria',
+}
+
+
+class ProcessOrderTest(TestCase):
+    '''This class tests how an order is placed.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Serums')
+        cls.products = Product.objects.bulk_create(
+            Product(name=f'Serum {i}', price=10 + i, category=category,
+                    image='uploads/product/test.jpg')
+            for i in range(30))
+        cls.user = User.objects.create_user('customer', password='a-long-password')
+
+    def setUp(self):
+        cache.clear()
+
+    def fill_cart(self, count: int) -> None:
+        '''This function puts count products in the cart and the shipping info in the session.'''
+        session = self.client.session
+        session['session_key'] = {str(product.id): 2 for product in self.products[:count]}
+        session.save()
+        self.client.post('/payment/billing_info', SHIPPING)
+
+    def place_order(self):
+        '''This function presses the 'Pay Now' button.'''
+        return self.client.post('/payment/process_order', {'card_name': 'Ana'})
+
+    def test_items_are_saved_with_one_insert(self):
+        self.client.force_login(self.user)
+        SavedCart.objects.create(user=self.user)
+        SavedCartItem.objects.create(cart_id=self.user.id, product=self.products[0])
+
+        # session, user, products, order, items, 3 sales tables, saved cart,
+        # session save, each write in a savepoint - the same for any number of lines
+        self.fill_cart(3)
+        with self.assertNumQueries(14):
+            self.place_order()
+        self.fill_cart(30)
+        with self.assertNumQueries(14):
+            response = self.place_order()
+        self.assertRedirects(response, '/payment/payment_success', fetch_redirect_response=False)
+
+        order = Order.objects.latest('id')
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 30)
+        # 2 x (10 + 11 + ... + 39)
+        self.assertEqual(order.amount_paid, 1470)
+        self.assertFalse(SavedCartItem.objects.exists())
+
+    def test_summary_is_shown_once(self):
+        self.fill_cart(2)
+        self.place_order()
+        response = self.client.get('/payment/payment_success')
+        self.assertContains(response, 'Serum 1 x 2: 22.00lv')
+        self.assertContains(response, 'Total: 42.00lv')
+
+        response = self.client.get('/payment/payment_success')
+        self.assertNotContains(response, 'Total:')
+
+    def test_failed_order_saves_nothing(self):
+        self.fill_cart(1)
+        with mock.patch.object(OrderItem.objects, 'bulk_create',
+                               side_effect=RuntimeError('database went away')):
+            with self.assertRaises(RuntimeError):
+                self.place_order()
+
+        self.assertFalse(Order.objects.exists())
+
+
+class CheckoutStateTest(TestCase):
+    '''This class tests how the shipping info is kept between the checkout and the payment.'''
+
+    def test_only_the_shipping_fields_are_kept(self):
+        response = self.client.post('/payment/billing_info', {**SHIPPING, 'extra': 'x' * 5000})
+        self.assertContains(response, 'Name: Ana Petrova')
+
+        session = self.client.session
+        self.assertNotIn('old_shipping', session)
+        self.assertLess(len(session[SESSION_KEY]), 300)
+        self.assertEqual(signing.loads(session[SESSION_KEY], salt=SALT), list(SHIPPING.values()))
+
+        self.client.post('/payment/billing_info', {**SHIPPING, 'shipping_city': 'Plovdiv'})
+        response = self.client.get('/payment/checkout')
+        self.assertContains(response, 'value="Plovdiv"')
+
+    def test_invalid_shipping_info_is_not_kept(self):
+        response = self.client.post('/payment/billing_info', {**SHIPPING, 'shipping_city': ''})
+        self.assertTemplateUsed(response, 'payment/checkout.html')
+        self.assertNotIn(SESSION_KEY, self.client.session)
+
+    def test_expired_checkout_goes_back_to_shipping(self):
+        self.client.post('/payment/billing_info', SHIPPING)
+        with self.settings(CHECKOUT_TTL=-1):
+            response = self.client.post('/payment/process_order', {'card_name': 'Ana'})
+        self.assertRedirects(response, '/payment/checkout', fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderShippingTest(TestCase):
+    '''This class tests how the shipping status of an order is changed.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='a-long-password')
+        cls.order = Order.objects.create(full_name='Ana Petrova', email='ana@example.com',
+                                         shipping_address='Sofia', amount_paid=20)
+
+    def test_save_writes_only_the_changed_fields(self):
+        order = Order.objects.get(id=self.order.id)
+        with self.assertNumQueries(0):
+            order.save()
+
+        order.shipped = True
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        updates = [query['sql'] for query in queries
+                   if query['sql'].startswith('UPDATE "payment_order"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('full_name', updates[0])
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT')])
+
+        order.refresh_from_db()
+        self.assertIsNotNone(order.date_shipped)
+
+    def test_save_after_refresh_writes_nothing(self):
+        order = Order.objects.get(id=self.order.id)
+        Order.objects.filter(id=order.id).set_shipped(True)
+        order.refresh_from_db()
+        self.assertTrue(order.shipped)
+        with self.assertNumQueries(0):
+            order.save()
+        self.assertEqual(DailySales.objects.get().shipped, 1)
+
+        # a field loaded later is also taken as loaded
+        order = Order.objects.only('id').get(id=order.id)
+        self.assertTrue(order.shipped)
+        with self.assertNumQueries(0):
+            order.save()
+        self.assertEqual(DailySales.objects.get().shipped, 1)
+
+    def test_every_entry_point_sets_the_shipped_date(self):
+        self.client.force_login(self.admin)
+        self.client.post('/payment/not_shipped_dashboard',
+                         {'num': self.order.id, 'shipping_status': 'true'})
+        order = Order.objects.get(id=self.order.id)
+        self.assertTrue(order.shipped)
+        shipped_on = order.date_shipped
+        self.assertIsNotNone(shipped_on)
+
+        # shipping again does not move the date
+        self.client.post(f'/payment/orders/{self.order.id}', {'shipping_status': 'true'})
+        self.assertEqual(Order.objects.get(id=self.order.id).date_shipped, shipped_on)
+
+        self.client.post('/payment/shipped_dashboard',
+                         {'num': self.order.id, 'shipping_status': 'false'})
+        self.assertFalse(Order.objects.get(id=self.order.id).shipped)
+
+
+class DashboardTest(TestCase):
+    '''This class tests the order dashboards.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='a-long-password')
+        cls.orders = Order.objects.bulk_create(
+            Order(full_name='Customer', email=f'customer{i % 3}@example.com',
+                  shipping_address='Sofia', amount_paid=10)
+            for i in range(60))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_orders_are_paged_newest_first(self):
+        response = self.client.get('/payment/not_shipped_dashboard')
+        page = response.context['orders']
+        self.assertEqual(len(page), 50)
+        self.assertEqual(page.object_list[0].id, self.orders[-1].id)
+        self.assertEqual(response.context['counts'], {'shipped': 0, 'not_shipped': 60})
+
+        response = self.client.get(f'/payment/not_shipped_dashboard?{page.next_query()}')
+        self.assertEqual([order.id for order in response.context['orders']],
+                         [order.id for order in reversed(self.orders[:10])])
+        self.assertFalse(response.context['orders'].has_next())
+
+    def test_filter_by_email(self):
+        response = self.client.get('/payment/not_shipped_dashboard',
+                                   {'email': 'customer1@', 'date_from': '2000-01-01'})
+        self.assertEqual(len(response.context['orders']), 20)
+
+    def test_bulk_ship_with_one_update(self):
+        self.client.get('/payment/shipped_dashboard')
+        ids = [order.id for order in self.orders[:25]]
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/payment/not_shipped_dashboard',
+                             {'selected': ids, 'shipping_status': 'true'})
+        self.assertEqual(len([query for query in queries
+                              if query['sql'].startswith('UPDATE "payment_order"')]), 1)
+        self.assertEqual(Order.objects.filter(shipped=True, date_shipped__isnull=False).count(), 25)
+
+        response = self.client.get('/payment/shipped_dashboard')
+        self.assertEqual(response.context['counts'], {'shipped': 25, 'not_shipped': 35})
+
+
+class OrderDetailTest(TestCase):
+    '''This class tests the order pages of the admin and of the customer.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Serums')
+        products = Product.objects.bulk_create(
+            Product(name=f'Serum {i}', price=10, category=category,
+                    image='uploads/product/test.jpg')
+            for i in range(10))
+        cls.user = User.objects.create_user('customer', password='a-long-password')
+        cls.other = User.objects.create_user('other', password='a-long-password')
+        cls.order = Order.objects.create(user=cls.user, full_name='Ana Petrova',
+                                         email='ana@example.com', shipping_address='Sofia',
+                                         amount_paid=200)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=cls.order, product=product, user=cls.user, quantity=2, price=10)
+            for product in products)
+
+    def test_order_is_loaded_with_two_queries(self):
+        with self.assertNumQueries(2):
+            detail = load_order(self.order.id)
+            names = [line.name for line in detail.lines]
+        self.assertEqual(names, [f'Serum {i}' for i in range(10)])
+        self.assertEqual(detail.total, 200)
+
+        admin = User.objects.create_superuser('admin', password='a-long-password')
+        self.client.force_login(admin)
+        response = self.client.get(f'/payment/orders/{self.order.id}')
+        self.assertContains(response, f'Order {self.order.id} - 200.00lv')
+        self.assertContains(response, 'Mark As Shipped')
+
+    def test_customer_sees_only_own_orders(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/payment/my_orders')
+        self.assertContains(response, f'/payment/my_orders/{self.order.id}')
+        response = self.client.get(f'/payment/my_orders/{self.order.id}')
+        self.assertContains(response, 'Serum 9')
+        self.assertNotContains(response, 'Mark As Shipped')
+
+        self.client.force_login(self.other)
+        response = self.client.get('/payment/my_orders')
+        self.assertNotContains(response, f'/payment/my_orders/{self.order.id}')
+        response = self.client.get(f'/payment/my_orders/{self.order.id}')
+        self.assertEqual(response.status_code, 404)
+
+
+class SalesTest(TestCase):
+    '''This class tests the sales tables and the sales report.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.serums = Category.objects.create(name='Serums')
+        cls.creams = Category.objects.create(name='Creams')
+        cls.serum = Product.objects.create(name='Night Serum', price=10, category=cls.serums,
+                                           image='uploads/product/test.jpg')
+        cls.cream = Product.objects.create(name='Day Cream', price=25, category=cls.creams,
+                                           image='uploads/product/test.jpg')
+        cls.admin = User.objects.create_superuser('admin', password='a-long-password')
+
+    def setUp(self):
+        cache.clear()
+
+    def place_order(self, cart: dict) -> Order:
+        '''This function places an order with the given cart (product to quantity).'''
+        session = self.client.session
+        session['session_key'] = {str(product.id): quantity for product, quantity in cart.items()}
+        session.save()
+        self.client.post('/payment/billing_info', SHIPPING)
+        self.client.post('/payment/process_order', {'card_name': 'Ana'})
+        return Order.objects.latest('id')
+
+    def totals(self) -> tuple:
+        '''This function returns the rows of the sales tables.'''
+        return (list(DailySales.objects.values_list('orders', 'shipped', 'units', 'revenue')),
+                dict(ProductSales.objects.values_list('product__name', 'revenue')),
+                dict(CategorySales.objects.values_list('category__name', 'units')))
+
+    def test_orders_and_shipping_are_added(self):
+        first = self.place_order({self.serum: 2, self.cream: 1})
+        self.place_order({self.serum: 1})
+        Order.objects.filter(id=first.id).set_shipped(True)
+
+        days, products, categories = self.totals()
+        self.assertEqual(days, [(2, 1, 4, 55)])
+        self.assertEqual(products, {'Night Serum': 30, 'Day Cream': 25})
+        self.assertEqual(categories, {'Serums': 3, 'Creams': 1})
+
+        # the admin path counts the same way
+        order = Order.objects.get(id=first.id)
+        order.shipped = False
+        order.save()
+        self.assertEqual(DailySales.objects.get().shipped, 0)
+
+    def test_rebuild_gives_the_same_totals(self):
+        first = self.place_order({self.serum: 2, self.cream: 1})
+        self.place_order({self.cream: 3})
+        Order.objects.filter(id=first.id).set_shipped(True)
+        totals = self.totals()
+
+        sales.rebuild(chunk_size=1)
+        self.assertEqual(self.totals(), totals)
+
+    def test_report_reads_only_the_sales_tables(self):
+        self.place_order({self.serum: 2, self.cream: 1})
+        self.client.force_login(self.admin)
+        # session, user, days, products, categories
+        with self.assertNumQueries(5):
+            response = self.client.get('/payment/sales_report')
+        self.assertContains(response, 'Night Serum')
+        self.assertContains(response, '45.00lv')
+
+
+class ExportTest(TestCase):
+    '''This class tests the export of the orders.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Serums')
+        cls.serum = Product.objects.create(name='Night Serum', price=10, category=category,
+                                           image='uploads/product/test.jpg')
+        cls.admin = User.objects.create_superuser('admin', password='a-long-password')
+        cls.orders = Order.objects.bulk_create(
+            Order(full_name=f'Customer {i}', email=f'customer{i}@example.com',
+                  shipping_address='Sofia', amount_paid=20, shipped=i < 2)
+            for i in range(5))
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=cls.serum, quantity=2, price=10)
+            for order in cls.orders[1:])
+
+    def test_items_are_read_per_chunk(self):
+        # the orders are read by one query, a chunk at a time,
+        # and the items of each of the 3 chunks by one more
+        with self.assertNumQueries(4):
+            lines = ''.join(export_lines(export_orders({}), 'csv', chunk_size=2)).splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[1].startswith(f'{self.orders[0].id},'))
+        self.assertTrue(lines[1].endswith(',,,'))
+        self.assertTrue(lines[2].endswith(f',{self.serum.id},Night Serum,2,10.00'))
+
+    def test_streaming_export_with_filters(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/payment/export/orders.jsonl', {'shipped': 'false'})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line)
+                for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['order_id'] for row in rows],
+                         [order.id for order in self.orders[2:]])
+        self.assertEqual(rows[0]['items'], [{'product_id': self.serum.id,
+                                             'product_name': 'Night Serum',
+                                             'quantity': 2, 'price': '10.00'}])
+
+    def test_formulas_are_not_exported(self):
+        order = Order.objects.create(full_name='=HYPERLINK("http://example.com")',
+                                     email='@evil@example.com', shipping_address='-1+2',
+                                     amount_paid=20)
+        lines = ''.join(export_lines(export_orders({'email': 'evil'}), 'csv')).splitlines()
+        self.assertEqual(lines[1], f'{order.id},{order.date_ordered.isoformat()},'
+                                   '"\'=HYPERLINK(""http://example.com"")",'
+                                   "'@evil@example.com,'-1+2,20.00,False,,,,,")
+
+        # the JSON lines keep the values as they are
+        row = json.loads(''.join(export_lines(export_orders({'email': 'evil'}), 'jsonl')))
+        self.assertEqual(row['full_name'], '=HYPERLINK("http://example.com")')
+
+    def test_command(self):
+        output = StringIO()
+        call_command('export_orders', '--email', 'customer3@', stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 2)
+
+
+class StockTest(TransactionTestCase):
+    '''This class tests that orders placed at the same time never sell more than the stock.'''
+
+    def setUp(self):
+        category = Category.objects.create(name='Serums')
+        self.limited = Product.objects.create(name='Limited Serum', price=30, category=category,
+                                              stock=5, image='uploads/product/test.jpg')
+        self.free = Product.objects.create(name='Daily Serum', price=10, category=category,
+                                           image='uploads/product/test.jpg')
+
+    def test_order_is_all_or_nothing(self):
+        with self.assertRaises(OutOfStock) as raised:
+            with transaction.atomic():
+                reserve_stock({self.free.id: 1, self.limited.id: 6})
+        self.assertEqual(raised.exception.products, [self.limited])
+        self.limited.refresh_from_db()
+        self.assertEqual(self.limited.stock, 5)
+
+    def test_no_oversell_with_parallel_orders(self):
+        results = []
+
+        def order():
+            try:
+                with transaction.atomic():
+                    reserve_stock({self.limited.id: 1})
+                results.append(True)
+            except OutOfStock:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=order) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 5)
+        self.assertEqual(results.count(False), 15)
+        self.limited.refresh_from_db()
+        self.assertEqual(self.limited.stock, 0)
+        self.assertEqual(sold_out_ids(), {self.limited.id})
@@ -10,5 +10,9 @@ urlpatterns = [
     path('shipped_dashboard', views.shipped_dashboard, name='shipped_dashboard'), 
     path('not_shipped_dashboard', views.not_shipped_dashboard, name='not_shipped_dashboard'), 
     path('orders/<int:pk>', views.orders, name = 'orders'),
+    path('export/orders.<str:export_format>', views.export, name='export_orders'),
+    path('sales_report', views.sales_report, name='sales_report'),
+    path('my_orders', views.my_orders, name='my_orders'),
+    path('my_orders/<int:pk>', views.my_order, name='my_order'),
 
 ]
\ No newline at end of file
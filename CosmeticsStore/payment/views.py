@@ -1,51 +1,134 @@
 '''This module contains the functions needed for the Payment operations.'''
 import datetime
+from django.db import transaction
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 
-from store.models import Profile
 from cart.cart import Cart
+from cart.store import clear_cart
 
+from store.inventory import OutOfStock, reserve_stock
+from store.pagination import paginate_newest
+
+from payment.checkout import CheckoutState, clear_state, load_state, save_state
+from payment.dashboard import dashboard_page, order_counts
+from payment.details import load_order
+from payment.export import CONTENT_TYPES, FORMATS, export_lines, export_orders
 from payment.forms import ShippingForm, PaymentForm
 from payment.models import ShippingAddress, Order, OrderItem
+from payment.models import CategorySales, DailySales, ProductSales
+from payment.sales import record_order
+
+MY_ORDERS_PAGE_SIZE = 20
+REPORT_DAYS = 30
+REPORT_PRODUCTS = 20
 
 
 def orders(request: HttpRequest, pk:int) -> HttpResponse:
     '''This function shows the admin to see all the orders.'''
     if request.user.is_authenticated and request.user.is_superuser:
-        order = Order.objects.filter(id=pk)
-        items = OrderItem.objects.filter(order=pk)
-
         if request.POST:
-            status = request.POST['shipping_status']
-            if status == "true":
-                now = datetime.datetime.now()
-                order.update(shipped=True, date_shipped=now)
-            else:
-                order.update(shipped=False)
-                messages.success(request, "Shipping Status Updated")
-                return redirect('home')
+            Order.objects.filter(id=pk).set_shipped(request.POST['shipping_status'] == "true")
+            messages.success(request, "Shipping Status Updated")
+            return redirect('home')
 
-        return render(request, 'payment/orders.html', {"order":order, "items":items})
+        detail = load_order(pk)
+        if detail is None:
+            raise Http404
+        return render(request, 'payment/orders.html',
+                      {"order":detail.order, "detail":detail, "can_ship":True})
 
     else:
         messages.success(request, "Access Denied")
         return redirect('home')
 
 
+def my_orders(request: HttpRequest) -> HttpResponse:
+    '''This function shows the orders of the user, newest first, a page at a time.'''
+    if request.user.is_authenticated:
+        orders = paginate_newest(Order.objects.filter(user=request.user), request.GET,
+                                 'date_ordered', MY_ORDERS_PAGE_SIZE)
+        return render(request, 'payment/my_orders.html', {'orders':orders})
+    else:
+        messages.success(request, "You Must Be Logged In To Access This Page!")
+        return redirect('home')
+
+
+def my_order(request: HttpRequest, pk:int) -> HttpResponse:
+    '''This function shows one order of the user.'''
+    if request.user.is_authenticated:
+        detail = load_order(pk, user=request.user)
+        if detail is None:
+            raise Http404
+        return render(request, 'payment/orders.html',
+                      {"order":detail.order, "detail":detail, "can_ship":False})
+    else:
+        messages.success(request, "You Must Be Logged In To Access This Page!")
+        return redirect('home')
+
+
+def sales_report(request: HttpRequest) -> HttpResponse:
+    '''This function shows the sales of the last days, the best selling products
+    and the sales of every category. It only reads the sales tables,
+    so it costs the same however many orders there are.'''
+    if request.user.is_authenticated and request.user.is_superuser:
+        since = timezone.localdate() - datetime.timedelta(days=REPORT_DAYS - 1)
+        days = DailySales.objects.filter(day__gte=since).order_by('-day')
+        products = (ProductSales.objects.select_related('product')
+                    .order_by('-revenue')[:REPORT_PRODUCTS])
+        categories = CategorySales.objects.select_related('category').order_by('-revenue')
+        return render(request, 'payment/sales_report.html',
+                      {'days':days, 'products':products, 'categories':categories})
+    else:
+        messages.success(request, 'Access Denied!')
+        return redirect('home')
+
+
+def order_dashboard(request: HttpRequest, shipped: bool, template: str) -> HttpResponse:
+    '''This function shows a page of the orders with one shipping status
+    and changes the status of the selected orders with one UPDATE.'''
+    if request.POST:
+        # a row button sends its order, the bulk button sends the checked ones
+        ids = [num for num in request.POST.getlist('num') or request.POST.getlist('selected')
+               if num.isdigit()]
+        updated = Order.objects.filter(id__in=ids).set_shipped(
+            request.POST['shipping_status'] == "true")
+        messages.success(request, f"Shipping Status Updated For {updated} Orders")
+        return redirect(request.get_full_path())
+
+    form, orders = dashboard_page(shipped, request.GET)
+    # the export links keep the filters of the page
+    export_params = request.GET.copy()
+    export_params.pop('after', None)
+    export_params['shipped'] = "true" if shipped else "false"
+    return render(request, template, {'orders':orders, 'filter_form':form,
+                                      'counts':order_counts(),
+                                      'export_query':export_params.urlencode()})
+
+
+def export(request: HttpRequest, export_format: str) -> HttpResponse:
+    '''This function sends the orders matching the filters of the query string,
+    with their items, as CSV or JSON lines. The file is streamed a chunk of orders
+    at a time, so it can be as long as the order history.'''
+    if request.user.is_authenticated and request.user.is_superuser:
+        if export_format not in FORMATS:
+            raise Http404
+        response = StreamingHttpResponse(
+            export_lines(export_orders(request.GET), export_format),
+            content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+        return response
+    else:
+        messages.success(request, 'Access Denied!')
+        return redirect('home')
+
+
 def shipped_dashboard(request: HttpRequest) -> HttpResponse:
     '''This function shows all the shipped orders.'''
     if request.user.is_authenticated and request.user.is_superuser:
-        orders = Order.objects.filter(shipped = True)
-        if request.POST:
-            num = request.POST['num']
-            order = Order.objects.filter(id=num)
-            now = datetime.datetime.now()
-            order.update(shipped=True, date_shipped=now)
-            messages.success(request, "Shipping Status Updated")
-            return redirect('home')
-        return render(request, 'payment/shipped_dashboard.html', {'orders':orders})
+        return order_dashboard(request, True, 'payment/shipped_dashboard.html')
     else:
         messages.success(request, 'Access Denied!')
         return redirect('home')
@@ -53,40 +136,39 @@ def shipped_dashboard(request: HttpRequest) -> HttpResponse:
 def not_shipped_dashboard(request: HttpResponse) -> HttpResponse:
     '''This function shows all the unshipped orders.'''
     if request.user.is_authenticated and request.user.is_superuser:
-        orders = Order.objects.filter(shipped = False)
-        if request.POST:
-            num = request.POST['num']
-            order = Order.objects.filter(id=num)
-            now = datetime.datetime.now()
-            order.update(shipped=True, date_shipped=now)
-            messages.success(request, "Shipping Status Updated")
-            return redirect('home')
-        return render(request, 'payment/not_shipped_dashboard.html', {'orders':orders})
+        return order_dashboard(request, False, 'payment/not_shipped_dashboard.html')
     else:
         messages.success(request, 'Access Denied!')
         return redirect('home')
 
-def create_order_items(order, cart_products, quantities, user=None):
+def create_order_items(order, cart_lines, user=None):
     """Helper function for process_order to create order items
-    based on cart products and quantities.
+    based on the priced lines of the cart, all of them with one INSERT.
+    """
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product_id=line.product.id,
+            user=user,
+            quantity=line.quantity,
+            price=line.product.price
+        )
+        for line in cart_lines
+    ])
+
+def order_summary(order, cart_lines) -> dict:
+    """Helper function for process_order that returns a short summary of the order
+    for the success page. It is kept in the session, so it only has plain values.
     """
-    for product in cart_products():
-        product_id = product.id
-        product_price = product.price
-        for key, value in quantities().items():
-            if int(key) == product.id:
-                OrderItem.objects.create(
-                    order=order,
-                    product_id=product_id,
-                    user=user,
-                    quantity=value,
-                    price=product_price
-                )
+    return {
+        'id': order.id,
+        'lines': [[line.product.name, line.quantity, str(line.total)] for line in cart_lines],
+        'total': str(order.amount_paid),
+    }
 
 def clear_user_cart(user):
-    """Helper function for process_order to clear the last cart from the database."""
-    current_user = Profile.objects.filter(id=user.id)
-    current_user.update(last_cart="")
+    """Helper function for process_order to clear the saved cart from the database."""
+    clear_cart(user)
 
 
 def clear_session_cart(request):
@@ -103,107 +185,107 @@ def process_order(request: HttpRequest) -> HttpResponse:
         messages.success(request, "Access denied")
         return redirect('home')
 
-    # Get the cart
-    cart = Cart(request)
-    cart_products = cart.get_products
-    quantities = cart.get_quantities
-    totals = cart.cart_total()
-
     # Get billing info from the last page
     payment_form = PaymentForm(request.POST or None)
-    # Get shipping session data
-    old_shipping = request.session.get('old_shipping')
-    if not old_shipping:
+    # Get the shipping info that was validated on the billing page
+    shipping = load_state(request)
+    if shipping is None:
         messages.error(request, "Shipping information is missing!")
-        return redirect('home')
-
-    # gather order info - the rest of the stuff from the order model
-    full_name = old_shipping['shipping_full_name']
-    email = old_shipping['shipping_email']
-    # create shipping address from session info
-    shipping_address = f"{old_shipping['shipping_address1']}\n{old_shipping['shipping_address2']}\n{old_shipping['shipping_city']}\n{old_shipping['shipping_zipcode']}\n{old_shipping['shipping_country']}"
-    amount_paid = totals
+        return redirect('checkout')
 
     # Determine if the user is logged in
     user = request.user if request.user.is_authenticated else None
 
-    # Create order (whether logged in or not)
-    order_data = {
-        'full_name': full_name,
-        'email': email,
-        'shipping_address': shipping_address,
-        'amount_paid': amount_paid
-    }
-
-    if user:
-        # Logged-in user
-        order_data['user'] = user
-        create_order = Order.objects.create(**order_data)
-        # Save cart items (order items)
-        create_order_items(create_order, cart_products, quantities, user)
-        clear_user_cart(user)
-    else:
-        # Guest user
-        create_order = Order.objects.create(**order_data)
-        create_order_items(create_order, cart_products, quantities)
+    # The order, all of its items and the stock are saved together or not at all
+    try:
+        with transaction.atomic():
+            # Get the priced cart, the prices come from one product query
+            snapshot = Cart(request).snapshot()
+            if not snapshot.lines:
+                messages.error(request, "Your cart is empty!")
+                return redirect('cart_summary')
+
+            # Take the counted products from the stock with one conditional update
+            reserve_stock({line.product.id: line.quantity for line in snapshot.lines
+                           if line.product.stock is not None})
+
+            # Create order (whether logged in or not)
+            order_data = {
+                'full_name': shipping.shipping_full_name,
+                'email': shipping.shipping_email,
+                'shipping_address': shipping.shipping_address,
+                'amount_paid': snapshot.total,
+                'user': user,
+            }
+            create_order = Order.objects.create(**order_data)
+            # Save cart items (order items)
+            create_order_items(create_order, snapshot.lines, user)
+            # Add the order to the sales report
+            record_order(create_order, snapshot.lines)
+            if user:
+                clear_user_cart(user)
+    except OutOfStock as error:
+        messages.error(request, str(error))
+        return redirect('cart_summary')
 
     # Clear session and cart
     clear_session_cart(request)
+    clear_state(request)
+    request.session['last_order'] = order_summary(create_order, snapshot.lines)
     messages.success(request, "Order placed successfully!")
-    return redirect('home')
+    return redirect('payment_success')
 
 
 def billing_info(request: HttpRequest) -> HttpResponse:
-    '''This function shows the Payment form after clicking 'Continue to billing'.'''
+    '''This function shows the Payment form after clicking 'Continue to billing'.
+    Only the validated shipping fields are kept for the payment.'''
     if request.POST:
 
-        cart = Cart(request)
-        cart_products = cart.get_products
-        quantities = cart.get_quantities
-        totals = cart.cart_total()
-
-        old_shipping = request.POST
-        request.session['old_shipping'] = old_shipping
+        snapshot = Cart(request).snapshot()
 
-        if request.user.is_authenticated:
-            billing_form = PaymentForm()
+        shipping_form = ShippingForm(request.POST)
+        if not shipping_form.is_valid():
+            return render(request, 'payment/checkout.html',
+                          {"cart_lines":snapshot.lines, "totals":snapshot.total,
+                           "shipping_form":shipping_form})
 
-            return render(request, 'payment/billing_info.html',
-						  {"cart_products":cart_products, "quantities":quantities,
-                           "totals":totals, "shipping_info":request.POST, "billing_form":billing_form})
+        shipping = CheckoutState.from_form(shipping_form)
+        save_state(request, shipping)
 
-        else:
-            billing_form = PaymentForm()
-            return render(request, 'payment/billing_info.html',
-						  {"cart_products":cart_products, "quantities":quantities,
-                           "totals":totals, "shipping_info":request.POST, "billing_form":billing_form})
+        billing_form = PaymentForm()
+        return render(request, 'payment/billing_info.html',
+                      {"cart_lines":snapshot.lines, "totals":snapshot.total,
+                       "shipping_info":shipping, "billing_form":billing_form})
 
     else:
         messages.success(request, 'Access Denied!')
         return redirect('home')
 
 def payment_success(request: HttpRequest)->HttpResponse:
-    '''This function handles successfull payment.'''
-    return render(request, 'payment/payment_success.html', {})
+    '''This function handles successfull payment.
+    It shows the summary of the order that was just placed, once.'''
+    return render(request, 'payment/payment_success.html',
+                  {'order':request.session.pop('last_order', None)})
 
 def checkout(request: HttpRequest)->HttpResponse:
-    '''This function handles checkout.'''
-    cart = Cart(request)
-    cart_products = cart.get_products
-    quantities = cart.get_quantities
-    totals = cart.cart_total()
+    '''This function handles checkout.
+    The shipping info given earlier in this checkout is filled in again.'''
+    snapshot = Cart(request).snapshot()
+    shipping = load_state(request)
+    initial = shipping.as_dict() if shipping else None
 
     if request.user.is_authenticated:
         shipping_user = ShippingAddress.objects.get(user__id=request.user.id)
 
-        shipping_form = ShippingForm(request.POST or None, instance=shipping_user)
+        shipping_form = ShippingForm(request.POST or None, instance=shipping_user,
+                                     initial=initial)
         return render(request, 'payment/checkout.html',
-                      {"cart_products":cart_products, "quantities":quantities,
-                       "totals":totals, "shipping_form":shipping_form})
+                      {"cart_lines":snapshot.lines, "totals":snapshot.total,
+                       "shipping_form":shipping_form})
 
     else:
-        shipping_form = ShippingForm(request.POST or None)
+        shipping_form = ShippingForm(request.POST or None, initial=initial)
 
         return render(request, 'payment/checkout.html', 
-                      {"cart_products":cart_products, "quantities":quantities,
-                       "totals":totals, "shipping_form":shipping_form})
+                      {"cart_lines":snapshot.lines, "totals":snapshot.total,
+                       "shipping_form":shipping_form})
@@ -6,13 +6,20 @@ from django.contrib.auth.models import User
 from .models import Category, Customer, Product, Order, Profile
 
 
-admin.site.register(Category)
 admin.site.register(Customer)
 admin.site.register(Product)
 admin.site.register(Order)
 admin.site.register(Profile)
 
 
+class CategoryAdmin(admin.ModelAdmin):
+    '''The class fills in the slug of a category from its name in the admin page.'''
+    model = Category
+    prepopulated_fields = {'slug': ('name',)}
+
+admin.site.register(Category, CategoryAdmin)
+
+
 class ProfileInLine(admin.StackedInline):
     '''The class is needed so we can show all the information of the profiles in the admin page.'''
     model = Profile
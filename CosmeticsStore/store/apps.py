@@ -6,3 +6,6 @@ class StoreConfig(AppConfig):
     '''This class contains the store app.'''
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self) -> None:
+        from . import signals # pylint: disable=import-outside-toplevel,unused-import
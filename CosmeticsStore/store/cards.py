@@ -0,0 +1,135 @@
+'''This module contains the cache of the rendered product cards of the listings.
+A card is kept under a key with the id and the version of its product.
+Saving a product (or its category) gives the product a new version,
+so an old card is never read again, even if it was written by a request
+that read the product just before the change.'''
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString
+
+from .models import Category, Product
+
+CARD_TEMPLATE = 'product_card.html'
+# changed when the card template changes, so the cards of the old template are not read
+CARD_TEMPLATE_VERSION = 2
+CARD_TIMEOUT = 60 * 60 * 24
+HITS_KEY = 'product_card_hits'
+MISSES_KEY = 'product_card_misses'
+
+
+def card_products():
+    '''This function returns the products with only the fields shown on a product card
+    and their category loaded in the same query.'''
+    return Product.objects.select_related('category').only(
+        'id', 'name', 'price', 'image', 'image_variants', 'category__name')
+
+
+class ProductCard(SafeString):
+    '''This class is the HTML of a card that also knows the id of its product,
+    so the listing can add the parts that depend on the customer around it.'''
+
+    def __new__(cls, html: str, product_id: int):
+        card = super().__new__(cls, html)
+        card.product_id = product_id
+        return card
+
+
+def _version_key(product_id: int) -> str:
+    return f'product_card_version:{product_id}'
+
+
+def _card_key(product_id: int, version: int) -> str:
+    return f'product_card:{CARD_TEMPLATE_VERSION}:{product_id}:{version}'
+
+
+def versions(product_ids: list) -> dict:
+    '''This function returns the version of every product, giving a version
+    to the products that don't have one yet.'''
+    found = cache.get_many([_version_key(product_id) for product_id in product_ids])
+    result, missing = {}, {}
+    for product_id in product_ids:
+        version = found.get(_version_key(product_id))
+        if version is None:
+            version = time.time_ns()
+            missing[_version_key(product_id)] = version
+        result[product_id] = version
+    if missing:
+        cache.set_many(missing, None)
+    return result
+
+
+def invalidate(product_ids: list) -> None:
+    '''This function gives the products a new version, so their cards are rendered again.'''
+    version = time.time_ns()
+    cache.set_many({_version_key(product_id): version for product_id in product_ids}, None)
+
+
+def _count(key: str, amount: int) -> None:
+    # incr is not atomic on every backend and costs a write, so it is only done on demand
+    if amount and getattr(settings, 'CARD_CACHE_STATS', False):
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            pass
+
+
+def counters() -> dict:
+    '''This function returns how many cards were read from the cache and how many were rendered,
+    while CARD_CACHE_STATS was on.'''
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': counts.get(HITS_KEY, 0), 'misses': counts.get(MISSES_KEY, 0)}
+
+
+def reset_counters() -> None:
+    '''This function sets the hit and miss counters back to zero.'''
+    cache.set_many({HITS_KEY: 0, MISSES_KEY: 0}, None)
+
+
+def product_cards(products) -> list:
+    '''This function returns the rendered cards of the products (or product ids), in order.
+    The cards are read from the cache with one call and the missing ones are
+    rendered from products loaded with a single query. Products that don't exist
+    anymore are left out.'''
+    product_ids = [getattr(product, 'id', product) for product in products]
+    if not product_ids:
+        return []
+
+    product_versions = versions(product_ids)
+    keys = {product_id: _card_key(product_id, product_versions[product_id])
+            for product_id in product_ids}
+    cached = cache.get_many(keys.values())
+
+    missing = [product_id for product_id in product_ids if keys[product_id] not in cached]
+    if missing:
+        rendered = {}
+        for product in card_products().in_bulk(missing).values():
+            rendered[keys[product.id]] = render_to_string(CARD_TEMPLATE, {'product': product})
+        cache.set_many(rendered, CARD_TIMEOUT)
+        cached.update(rendered)
+
+    _count(HITS_KEY, len(product_ids) - len(missing))
+    _count(MISSES_KEY, len(missing))
+    return [ProductCard(cached[keys[product_id]], product_id) for product_id in product_ids
+            if keys[product_id] in cached]
+
+
+def product_changed(sender, instance: Product, **kwargs) -> None:
+    '''This function renders the card of a product again once its change is committed.'''
+    product_id = instance.id
+    transaction.on_commit(lambda: invalidate([product_id]))
+
+
+def category_changed(sender, instance: Category, **kwargs) -> None:
+    '''This function renders the cards of the products of a category again
+    once the change of the category is committed, since the cards show its name.'''
+    category_id = instance.id
+
+    def changed():
+        invalidate(list(Product.objects.filter(category_id=category_id)
+                        .values_list('id', flat=True)))
+    transaction.on_commit(changed)
@@ -0,0 +1,54 @@
+'''This module contains the in-process cache of the categories
+and of the number of products in each of them.
+The cache is kept with the catalog version it was read at. The version is shared
+by the processes of the site, so a change made in another process is seen too.'''
+import threading
+
+from django.db import transaction
+from django.db.models import Count
+
+from .conditional import catalog_version
+from .models import Category
+
+_lock = threading.Lock()
+_categories = None
+_by_slug = {}
+_version = None
+
+
+def _load() -> tuple:
+    global _categories, _by_slug, _version
+    # read before the categories, so a change committed meanwhile gives a newer version
+    version = catalog_version()
+    with _lock:
+        if _categories is None or _version != version:
+            _categories = list(Category.objects.annotate(product_count=Count('product'))
+                               .order_by('name'))
+            _by_slug = {category.slug: category for category in _categories}
+            _version = version
+        return _categories, _by_slug
+
+
+def categories() -> list:
+    '''This function returns all the categories sorted by name, each with product_count.
+    They are read with one query the first time and kept until a category
+    or a product is changed, in any process.'''
+    return _load()[0]
+
+
+def category_by_slug(slug: str) -> Category|None:
+    '''This function returns the category with the given slug, or None.'''
+    return _load()[1].get(slug)
+
+
+def clear() -> None:
+    '''This function empties the cache, so it is read again when it is needed.'''
+    global _categories, _by_slug
+    with _lock:
+        _categories = None
+        _by_slug = {}
+
+
+def catalog_changed(sender, **kwargs) -> None:
+    '''This function clears the cache once a product or a category change is committed.'''
+    transaction.on_commit(clear)
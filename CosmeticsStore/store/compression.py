@@ -0,0 +1,116 @@
+'''This module contains the gzip and brotli compression of the site.
+The CSS and JS files are compressed once by collectstatic and the compressed
+copy is picked by the static view; the HTML and JSON pages are compressed
+by store.middleware.CompressionMiddleware. Brotli is only used if the
+brotli package is installed.
+'''
+import gzip
+import zlib
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# the static files that are worth compressing, images are already compressed
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.json', '.map', '.ico')
+# file suffix of every content coding, best first
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings() -> list:
+    '''This function returns the content codings this server can make, best first.'''
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def accepted_encodings(header: str) -> set:
+    '''This function returns the content codings of an Accept-Encoding header
+    that are not refused with q=0.'''
+    accepted = set()
+    for part in header.split(','):
+        coding, _, parameters = part.strip().partition(';')
+        quality = parameters.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(header: str, encodings: list) -> str|None:
+    '''This function returns the first of the encodings the client accepts, or None.'''
+    accepted = accepted_encodings(header or '')
+    for encoding in encodings:
+        if encoding in accepted or '*' in accepted:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    '''This function compresses the data with the best level, for files compressed once.'''
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class StreamCompressor():
+    '''This class compresses a response piece by piece.
+    Every piece is flushed, so the client can show it before the rest arrives.'''
+
+    def __init__(self, encoding: str, level: int) -> None:
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=level)
+        else:
+            # wbits=31 writes the gzip header and trailer
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        '''This function compresses one piece of the response.'''
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        '''This function returns the end of the compressed response.'''
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    '''This class gives the static files a name with the hash of their content
+    (so they can be cached for good) and writes a .gz copy, and a .br copy
+    if brotli is installed, of every hashed CSS and JS file.'''
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = []
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.append(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for hashed_name in hashed_names:
+            if hashed_name.endswith(COMPRESSED_EXTENSIONS):
+                yield from self.compress_file(hashed_name)
+
+    def compress_file(self, name: str):
+        '''This generator writes the compressed copies of a file that are smaller than it.'''
+        with self.open(name) as file:
+            data = file.read()
+        for encoding in available_encodings():
+            compressed = compress(data, encoding)
+            if len(compressed) < len(data):
+                compressed_name = name + SUFFIXES[encoding]
+                if self.exists(compressed_name):
+                    self.delete(compressed_name)
+                self._save(compressed_name, ContentFile(compressed))
+                yield compressed_name, compressed_name, True
@@ -0,0 +1,88 @@
+'''This module contains the conditional GET (ETag and Last-Modified) of the catalog pages.
+The pages depend on the catalog, which has a version that is changed
+by every product and category save, and on a few things of the visitor:
+their login, the size of their cart, their wishlist and their CSRF cookie.
+'''
+import datetime
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+VERSION_KEY = 'catalog_version'
+
+
+def catalog_version() -> int:
+    '''This function returns the version of the catalog,
+    which is the time (in seconds) of the last change of a product or a category.
+    It is kept in the 'versions' cache, which is shared by the processes of the site.'''
+    versions = caches['versions']
+    version = versions.get(VERSION_KEY)
+    if version is None:
+        versions.add(VERSION_KEY, int(time.time()), None)
+        version = versions.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version() -> None:
+    '''This function gives the catalog a new version.
+    The version always moves forward by at least a second,
+    because Last-Modified only has seconds.'''
+    caches['versions'].set(VERSION_KEY, max(int(time.time()), catalog_version() + 1), None)
+
+
+def catalog_changed(sender, **kwargs) -> None:
+    '''This function changes the version of the catalog once a change is committed.'''
+    transaction.on_commit(bump_catalog_version)
+
+
+def _visitor(request) -> tuple|None:
+    '''This function returns the parts of the page that depend on the visitor.
+    It returns None if the visitor has messages waiting, because the page
+    must then be rendered to show them.'''
+    if len(get_messages(request)):
+        return None
+    session = request.session
+    return (session.get('_auth_user_id'),
+            len(session.get('session_key', {})),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            tuple(session.get('wishlist_ids') or ()))
+
+
+def catalog_etag(request, *args, **kwargs) -> str|None:
+    '''This function returns the ETag of a catalog page for this visitor.'''
+    visitor = _visitor(request)
+    if visitor is None:
+        return None
+    key = f'{catalog_version()}|{visitor}'
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def catalog_last_modified(request, *args, **kwargs) -> datetime.datetime|None:
+    '''This function returns when the catalog was changed,
+    but only for visitors who see the page like everybody else
+    (not logged in, empty cart and wishlist), since Last-Modified can't tell visitors apart.'''
+    if _visitor(request) != (None, 0, request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''), ()):
+        return None
+    return datetime.datetime.fromtimestamp(catalog_version(), tz=datetime.timezone.utc)
+
+
+def catalog_page(view):
+    '''This decorator answers a revalidation of a catalog page with 304 Not Modified
+    if the catalog and the visitor didn't change, without running the view.
+    The browser and the CDN are told to always revalidate the page.'''
+    conditional_view = condition(etag_func=catalog_etag,
+                                 last_modified_func=catalog_last_modified)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        patch_cache_control(response, no_cache=True)
+        return response
+    return wrapper
@@ -0,0 +1,8 @@
+'''This module contains a context processor so the categories menu
+of the navbar is shown throughout all pages.'''
+from .catalog import categories
+
+
+def category_menu(request):
+    '''This function returns the categories for the navbar, from the category cache.'''
+    return {'category_menu': categories}
@@ -0,0 +1,189 @@
+'''This module contains the category and price filters of the product listings
+and the number of products for every filter value.
+The price ranges are also counted within every category ('category_price' counts,
+with values like '3:20-50'), so the price counts of a category page are its own.
+The counts are changed in the database, and each process keeps a copy
+that is read again when the shared catalog version changes.'''
+import threading
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.http import QueryDict
+
+from .catalog import categories, category_by_slug
+from .conditional import bump_catalog_version, catalog_version
+from .models import FacetCount, Product
+
+_lock = threading.Lock()
+_counts = None
+_version = None
+
+# key, lowest price, price the range stops before
+PRICE_RANGES = [
+    ('0-20', 0, 20),
+    ('20-50', 20, 50),
+    ('50-100', 50, 100),
+    ('100-', 100, None),
+]
+
+
+def price_range(price) -> str:
+    '''This function returns the key of the price range of a price.'''
+    for key, low, high in PRICE_RANGES:
+        if price >= low and (high is None or price < high):
+            return key
+    return PRICE_RANGES[0][0]
+
+
+def product_facets(category_id: int, price) -> list:
+    '''This function returns the filter values a product is counted in.'''
+    key = price_range(price)
+    return [('category', str(category_id)), ('price', key),
+            ('category_price', f'{category_id}:{key}')]
+
+
+def change_count(facet: str, value: str, delta: int) -> None:
+    '''This function adds delta to the count of a filter value in the database.'''
+    counts = FacetCount.objects.filter(facet=facet, value=value)
+    if not counts.update(count=F('count') + delta):
+        FacetCount.objects.bulk_create([FacetCount(facet=facet, value=value)],
+                                       ignore_conflicts=True)
+        counts.update(count=F('count') + delta)
+
+
+def rebuild() -> None:
+    '''This function counts the whole catalog again, with one query.
+    It is only needed after products are changed without signals, like bulk_create.'''
+    rows = []
+    price_totals = dict.fromkeys((key for key, _, _ in PRICE_RANGES), 0)
+    for row in Product.objects.values('category_id').annotate(total=Count('id'), **{
+            key: Count('id', filter=Q(price__gte=low) & (Q(price__lt=high) if high else Q()))
+            for key, low, high in PRICE_RANGES}).order_by():
+        category_id = row['category_id']
+        rows.append(FacetCount(facet='category', value=str(category_id), count=row['total']))
+        for key in price_totals:
+            price_totals[key] += row[key]
+            rows.append(FacetCount(facet='category_price', value=f'{category_id}:{key}',
+                                   count=row[key]))
+    rows += [FacetCount(facet='price', value=key, count=count)
+             for key, count in price_totals.items()]
+
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(rows)
+        transaction.on_commit(clear)
+        transaction.on_commit(bump_catalog_version)
+
+
+def facet_counts() -> dict:
+    '''This function returns the count of every filter value.
+    The counts are read with one small query and kept in memory
+    until a product change is committed, in any process.'''
+    global _counts, _version
+    # read before the counts, so a change committed meanwhile gives a newer version
+    version = catalog_version()
+    with _lock:
+        if _counts is None or _version != version:
+            _counts = {(facet, value): count for facet, value, count
+                       in FacetCount.objects.values_list('facet', 'value', 'count')}
+            _version = version
+        return _counts
+
+
+def clear() -> None:
+    '''This function forgets the counts kept in memory.'''
+    global _counts
+    with _lock:
+        _counts = None
+_version = None
+
+
+def filter_products(queryset, params: QueryDict):
+    '''This function applies the category and price filters of the request to the products.
+    Both use an index: the category foreign key and the price.'''
+    category = category_by_slug(params.get('category', ''))
+    if category is not None:
+        queryset = queryset.filter(category_id=category.id)
+
+    for key, low, high in PRICE_RANGES:
+        if params.get('price') == key:
+            queryset = queryset.filter(price__gte=low)
+            if high is not None:
+                queryset = queryset.filter(price__lt=high)
+    return queryset
+
+
+def _link(params: QueryDict, name: str, value: str) -> tuple:
+    '''This function returns the query string that turns a filter value on or off
+    and whether it is on now.'''
+    params = params.copy()
+    params.pop('after', None)
+    params.pop('page', None)
+    active = params.get(name) == value
+    if active:
+        params.pop(name)
+    else:
+        params[name] = value
+    return params.urlencode(), active
+
+
+def facet_links(params: QueryDict, category=None) -> dict:
+    '''This function returns the filter links of a listing page with their counts.
+    On the page of a category there are no category links and the price counts
+    are the ones of the category, like when the category filter is on.'''
+    counts = facet_counts()
+    links = {'categories': [], 'prices': []}
+
+    selected = category or category_by_slug(params.get('category', ''))
+    if category is None:
+        for category in categories():
+            query, active = _link(params, 'category', category.slug)
+            links['categories'].append({
+                'label': category.name, 'query': query, 'active': active,
+                'count': counts.get(('category', str(category.id)), 0)})
+
+    for key, low, high in PRICE_RANGES:
+        query, active = _link(params, 'price', key)
+        label = f'{low} - {high} lv' if high is not None else f'{low}+ lv'
+        count_key = (('category_price', f'{selected.id}:{key}') if selected is not None
+                     else ('price', key))
+        links['prices'].append({'label': label, 'query': query, 'active': active,
+                                'count': counts.get(count_key, 0)})
+    return links
+
+
+def product_before_save(sender, instance: Product, **kwargs) -> None:
+    '''This function finds the filter values the product was counted in before the save.
+    They are taken from the values the product was loaded with,
+    the row is only read again if they are missing.'''
+    loaded = getattr(instance, 'loaded_values', {})
+    if instance._state.adding:
+        instance.old_facets = []
+    elif 'category_id' in loaded and 'price' in loaded:
+        instance.old_facets = product_facets(loaded['category_id'], loaded['price'])
+    else:
+        old = Product.objects.filter(pk=instance.pk).values_list('category_id', 'price').first()
+        instance.old_facets = product_facets(*old) if old else []
+
+
+def product_saved(sender, instance: Product, **kwargs) -> None:
+    '''This function moves the product to its new filter values, if they changed.'''
+    old_facets = getattr(instance, 'old_facets', [])
+    new_facets = product_facets(instance.category_id, instance.price)
+    for facet, value in old_facets:
+        if (facet, value) not in new_facets:
+            change_count(facet, value, -1)
+    for facet, value in new_facets:
+        if (facet, value) not in old_facets:
+            change_count(facet, value, 1)
+
+    instance.loaded_values = {**getattr(instance, 'loaded_values', {}),
+                              'category_id': instance.category_id, 'price': instance.price}
+    transaction.on_commit(clear)
+
+
+def product_deleted(sender, instance: Product, **kwargs) -> None:
+    '''This function removes a deleted product from the counts.'''
+    for facet, value in product_facets(instance.category_id, instance.price):
+        change_count(facet, value, -1)
+    transaction.on_commit(clear)
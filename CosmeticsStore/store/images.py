@@ -0,0 +1,184 @@
+'''This module contains the resized copies (variants) of the product images.
+When a product is saved with a new image, WebP and JPEG copies at a few widths
+and a tiny blurred placeholder are made in a process pool, so the save doesn't wait.
+The names of the copies are kept in Product.image_variants.
+Each job writes to its own directory, named after the content of the image,
+so jobs for the same product never remove each other's files. The directory
+of the previous variants is removed only once the product uses the new ones.
+'''
+import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from . import cards
+from .conditional import bump_catalog_version
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 1024)
+VARIANTS_DIR = 'uploads/product/variants'
+# format, file extension, options of Image.save
+FORMATS = [
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+]
+PLACEHOLDER_WIDTH = 16
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    '''This function puts a transparent image on a white background, since JPEG has no alpha.'''
+    if image.mode == 'RGB':
+        return image
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(64 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def make_variants(source_path: str, source_name: str, media_root: str, target: str,
+                  widths: tuple = WIDTHS) -> dict:
+    '''This function makes the variants of one image and returns their names.
+    It runs in a worker process, so it only uses the file system and Pillow.
+    The copies are written to a directory in target named after the content of the image,
+    each one under a temporary name first, so a job making the same copies never reads half a file.
+    The widths that are larger than the image are left out.'''
+    with Image.open(source_path) as opened:
+        image = _to_rgb(ImageOps.exif_transpose(opened))
+    width, height = image.size
+    sizes = sorted({size for size in widths if size < width} | {min(width, widths[-1])})
+
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    target = f'{target}/{_digest(source_path)}'
+    directory = os.path.join(media_root, target)
+    os.makedirs(directory, exist_ok=True)
+    variants = {'source': source_name, 'width': width, 'height': height, 'directory': target}
+    for size in sizes:
+        resized = image.resize((size, max(1, round(height * size / width))), Image.LANCZOS)
+        for key, image_format, options in FORMATS:
+            filename = f'{stem}-{size}.{key}'
+            path = os.path.join(directory, filename)
+            resized.save(f'{path}.{os.getpid()}.tmp', image_format, **options)
+            os.replace(f'{path}.{os.getpid()}.tmp', path)
+            variants.setdefault(key, []).append([size, f'{target}/{filename}'])
+
+    tiny = image.resize((PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))),
+                        Image.BILINEAR)
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'JPEG', quality=40)
+    variants['placeholder'] = ('data:image/jpeg;base64,'
+                               + base64.b64encode(buffer.getvalue()).decode())
+    return variants
+
+
+def needs_variants(product: Product) -> bool:
+    '''This function tells if the image of the product has no variants yet.
+    Images that are not in the storage are skipped.'''
+    name = product.image.name
+    return (bool(name) and (product.image_variants or {}).get('source') != name
+            and product.image.storage.exists(name))
+
+
+def job(product: Product) -> tuple:
+    '''This function returns the arguments of make_variants for a product.'''
+    return (product.image.path, product.image.name, str(settings.MEDIA_ROOT),
+            f'{VARIANTS_DIR}/{product.id}')
+
+
+def _directory(variants: dict) -> str|None:
+    '''This function returns the directory of the variants. The variants made
+    before each job had its own directory are in the directory of the product.'''
+    if 'directory' in variants:
+        return variants['directory']
+    for key, _, _ in FORMATS:
+        if variants.get(key):
+            return os.path.dirname(variants[key][0][1])
+    return None
+
+
+def remove_variants(directory: str|None) -> None:
+    '''This function removes the files of the variants in the directory
+    and the directory itself when nothing else is left in it.'''
+    if not directory:
+        return
+    path = os.path.join(settings.MEDIA_ROOT, directory)
+    if not os.path.isdir(path):
+        return
+    for entry in os.scandir(path):
+        if entry.is_file():
+            os.remove(entry.path)
+    if not os.listdir(path):
+        os.rmdir(path)
+
+
+def save_variants(product_id: int, variants: dict) -> bool:
+    '''This function keeps the variants of a product, if its image wasn't changed
+    while they were made, and renders its card again.
+    Once the product uses them, the directory of its previous variants is removed.
+    Variants of an image that was changed meanwhile are removed instead.'''
+    with transaction.atomic():
+        previous = (Product.objects.filter(id=product_id)
+                    .values_list('image_variants', flat=True).first())
+        updated = Product.objects.filter(id=product_id, image=variants['source']).update(
+            image_variants=variants)
+    directory, stale = _directory(variants), _directory(previous or {})
+    if updated:
+        cards.invalidate([product_id])
+        bump_catalog_version()
+    if stale != directory:
+        remove_variants(stale if updated else directory)
+    return bool(updated)
+
+
+def executor(max_workers: int|None = None) -> ProcessPoolExecutor:
+    '''This function returns the process pool that makes the variants, started when first needed.'''
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers or getattr(settings, 'IMAGE_WORKERS', 2))
+        return _executor
+
+
+def _saver(product_id: int):
+    def done(future) -> None:
+        # runs in a thread of this process when the worker is done
+        try:
+            save_variants(product_id, future.result())
+        except Exception:
+            logger.exception('Could not make the image variants of product %s', product_id)
+        finally:
+            connection.close()
+    return done
+
+
+def product_saved(sender, instance: Product, **kwargs) -> None:
+    '''This function makes the variants of a new image once the save is committed.'''
+    if needs_variants(instance):
+        arguments = job(instance)
+        product_id = instance.id
+
+        def submit():
+            executor().submit(make_variants, *arguments).add_done_callback(_saver(product_id))
+        transaction.on_commit(submit)
@@ -0,0 +1,73 @@
+'''This module contains the stock of the products.
+The stock is taken with one conditional UPDATE for the whole order
+(stock = stock - n where stock >= n), so checkouts never read the stock
+and then write it, and two checkouts can't sell the same last product.
+Products with an empty stock are not counted and are always available.
+'''
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from .conditional import bump_catalog_version
+from .models import Product
+
+SOLD_OUT_KEY = 'sold_out_ids'
+# the ids are read again after this many seconds even if no change reached the cache
+SOLD_OUT_TTL = 5 * 60
+
+
+class OutOfStock(Exception):
+    '''This exception is raised when some products of an order are not in stock anymore.'''
+
+    def __init__(self, products: list) -> None:
+        self.products = products
+        super().__init__('Not enough in stock: ' + ', '.join(product.name for product in products))
+
+
+def reserve_stock(quantities: dict) -> None:
+    '''This function takes the ordered quantities (product id to quantity) from the stock.
+    Either all of them are taken or, if one product hasn't got enough,
+    none of them and OutOfStock is raised. It must run in the transaction of the order.'''
+    if not quantities:
+        return
+    needed = Case(*[When(id=product_id, then=Value(quantity))
+                    for product_id, quantity in quantities.items()],
+                  output_field=IntegerField())
+    with transaction.atomic():
+        updated = (Product.objects.filter(id__in=quantities)
+                   .filter(Q(stock__isnull=True) | Q(stock__gte=needed))
+                   .update(stock=F('stock') - needed))
+        if updated != len(quantities):
+            # the products that are missing, only read when the order fails
+            missing = [product for product in Product.objects.filter(id__in=quantities,
+                                                                     stock__isnull=False)
+                       if product.stock < quantities[product.id]]
+            raise OutOfStock(missing)
+
+    sold_out = Product.objects.filter(id__in=quantities, stock=0).exists()
+    if sold_out:
+        transaction.on_commit(stock_changed)
+
+
+def sold_out_ids() -> set:
+    '''This function returns the ids of the products that are sold out.
+    They are read with one query and kept in the cache until the stock changes,
+    or for SOLD_OUT_TTL seconds at most.'''
+    ids = cache.get(SOLD_OUT_KEY)
+    if ids is None:
+        ids = list(Product.objects.filter(stock=0).values_list('id', flat=True))
+        cache.set(SOLD_OUT_KEY, ids, SOLD_OUT_TTL)
+    return set(ids)
+
+
+def stock_changed() -> None:
+    '''This function reads the sold out products again the next time they are needed
+    and changes the version of the catalog, since the pages show them.'''
+    cache.delete(SOLD_OUT_KEY)
+    bump_catalog_version()
+
+
+def product_saved(sender, instance: Product, **kwargs) -> None:
+    '''This function clears the sold out products when a product is saved,
+    since its stock may have been changed in the admin page.'''
+    transaction.on_commit(stock_changed)
@@ -0,0 +1,84 @@
+'''This module contains a benchmark of the compression of the static files and pages.'''
+import time
+
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from store.compression import COMPRESSED_EXTENSIONS, available_encodings, compress
+from store.models import Category, Product
+
+
+class Command(BaseCommand):
+    '''This class prints the bytes saved by compressing the CSS and JS files
+    (and what it costs once, at collectstatic) and by compressing the pages
+    (and the CPU time it adds to every request). Everything is rolled back at the end.'''
+    help = 'Shows the bytes saved and the CPU cost of the static and page compression.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        encodings = available_encodings()
+        self.static_files(encodings)
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            self.pages(encodings, options['products'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def static_files(self, encodings: list) -> None:
+        '''This function compresses the CSS and JS files like collectstatic does.'''
+        self.stdout.write('static file'.ljust(28) + 'bytes'.rjust(10)
+                          + ''.join(f'{encoding:>10}{"ms":>8}' for encoding in encodings))
+        for finder in finders.get_finders():
+            for path, storage in finder.list(['admin/*']):
+                if not path.endswith(COMPRESSED_EXTENSIONS):
+                    continue
+                with storage.open(path) as file:
+                    data = file.read()
+                line = path[-28:].ljust(28) + f'{len(data):10}'
+                for encoding in encodings:
+                    started = time.process_time()
+                    compressed = compress(data, encoding)
+                    line += f'{len(compressed):10}{(time.process_time() - started) * 1000:8.2f}'
+                self.stdout.write(line)
+        self.stdout.write('the compressed copies are sent as they are, '
+                          'with no CPU time at request time\n')
+
+    def pages(self, encodings: list, products: int, repeat: int) -> None:
+        '''This function requests the pages with and without compression.'''
+        if not Product.objects.exists():
+            category = Category.objects.create(name='Benchmark')
+            Product.objects.bulk_create(
+                Product(name=f'Product {i}', price=10, category=category,
+                        image='uploads/product/benchmark.jpg')
+                for i in range(products))
+        product = Product.objects.select_related('category').first()
+        urls = [reverse('home'), reverse('category', args=[product.category.slug]),
+                reverse('product', args=[product.id]), f"{reverse('search')}?q=product",
+                f"{reverse('search_suggest')}?q=pro", reverse('cart_summary')]
+
+        client = Client()
+        self.stdout.write('page'.ljust(28) + 'encoding'.rjust(10) + 'bytes'.rjust(10)
+                          + 'saved'.rjust(8) + 'cpu ms'.rjust(9))
+        for url in urls:
+            plain_size = plain_cpu = None
+            for encoding in [None] + encodings:
+                headers = {'HTTP_ACCEPT_ENCODING': encoding} if encoding else {}
+                client.get(url, **headers)
+                started = time.process_time()
+                for _ in range(repeat):
+                    response = client.get(url, **headers)
+                cpu = (time.process_time() - started) * 1000 / repeat
+                size = len(response.content)
+                if encoding is None:
+                    plain_size, plain_cpu = size, cpu
+                    saved, extra = '', f'{cpu:9.2f}'
+                else:
+                    saved = f'{(1 - size / plain_size) * 100:7.0f}%'
+                    extra = f'{cpu:9.2f} ({cpu - plain_cpu:+.2f})'
+                self.stdout.write(url[:28].ljust(28) + (encoding or 'none').rjust(10)
+                                  + f'{size:10}' + saved.rjust(8) + extra)
@@ -0,0 +1,79 @@
+'''This module contains a benchmark of the revalidation of the catalog pages.'''
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from store.models import Category, Product
+
+
+class Command(BaseCommand):
+    '''This class requests the catalog pages as a full load, as a browser revalidation
+    (logged-in customer with a cart, If-None-Match) and as a CDN revalidation
+    (anonymous, If-Modified-Since) and prints the status, time, bytes and queries.
+    Everything is rolled back at the end.'''
+    help = 'Compares full loads of the catalog pages with their revalidations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            urls = self.catalog_urls(options['products'])
+
+            browser = Client()
+            User.objects.create_user('bench-revalidation', password='a-long-password')
+            browser.login(username='bench-revalidation', password='a-long-password')
+            session = browser.session
+            session['session_key'] = {str(Product.objects.values_list('id', flat=True)[0]): 1}
+            session.save()
+            cdn = Client()
+
+            self.stdout.write(f"{Product.objects.count()} products, "
+                              f"mean of {options['repeat']} requests per page")
+            self.stdout.write('page'.ljust(24) + 'mode'.ljust(10)
+                              + 'status'.rjust(8) + 'ms'.rjust(10) + 'bytes'.rjust(10)
+                              + 'queries'.rjust(9))
+            for url in urls:
+                # the first visit of a page with a form sets the CSRF cookie
+                browser.get(url)
+                first = browser.get(url)
+                self.report(url, 'full', browser, url, {}, options['repeat'])
+                self.report(url, 'browser', browser, url,
+                            {'HTTP_IF_NONE_MATCH': first['ETag']}, options['repeat'])
+                anonymous = cdn.get(url)
+                self.report(url, 'cdn', cdn, url,
+                            {'HTTP_IF_MODIFIED_SINCE': anonymous['Last-Modified']},
+                            options['repeat'])
+            transaction.set_rollback(True)
+
+    def catalog_urls(self, count: int) -> list:
+        '''This function returns the catalog pages,
+        creating products first if the catalog is empty.'''
+        if not Product.objects.exists():
+            category = Category.objects.create(name='Benchmark')
+            Product.objects.bulk_create(
+                Product(name=f'Product {i}', price=10, category=category,
+                        image='uploads/product/benchmark.jpg')
+                for i in range(count))
+        product = Product.objects.select_related('category').first()
+        return [reverse('home'), reverse('category_summary'),
+                reverse('category', args=[product.category.slug]),
+                reverse('product', args=[product.id])]
+
+    def report(self, page: str, mode: str, client: Client, url: str, headers: dict,
+               repeat: int) -> None:
+        '''This function requests the page and prints one line of the results.'''
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(repeat):
+                response = client.get(url, **headers)
+        ms = (time.perf_counter() - started) * 1000 / repeat
+        self.stdout.write(page.ljust(24) + mode.ljust(10) + f'{response.status_code:8}'
+                          + f'{ms:10.2f}' + f'{len(response.content):10}'
+                          + f'{len(queries) / repeat:9.1f}')
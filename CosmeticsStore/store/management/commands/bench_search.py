@@ -0,0 +1,91 @@
+'''This module contains a benchmark of the product search.'''
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from store.models import Category, Product
+from store.search import FTSBackend, InvertedIndexBackend, fts_available
+
+WORDS = ['hydrating', 'serum', 'toner', 'cleanser', 'moisturizer', 'vitamin', 'niacinamide',
+         'hyaluronic', 'acid', 'retinol', 'sunscreen', 'spf', 'gel', 'cream', 'foam', 'oil',
+         'calming', 'brightening', 'peptide', 'ceramide', 'green', 'tea', 'aloe', 'charcoal',
+         'clay', 'mask', 'pigment', 'control', 'night', 'daily', 'sensitive', 'skin']
+QUERIES = ['serum', 'hyaluronic acid', 'vit', 'sun', 'charcoal clay mask', 'zzz']
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'por', 'lin', 'dex']
+
+
+def make_vocabulary(size: int) -> list:
+    '''This function returns made-up words, so most of a description
+    is not one of the words that are searched.'''
+    vocabulary = set()
+    while len(vocabulary) < size:
+        vocabulary.add(''.join(random.choices(SYLLABLES, k=random.randint(2, 4))))
+    return sorted(vocabulary)
+
+
+class Command(BaseCommand):
+    '''This class fills the catalog with generated products and times the old
+    icontains search against the FTS5 table and the in-memory inverted index.
+    Everything is rolled back at the end.'''
+    help = 'Compares the icontains search with the full-text search backends.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        random.seed(1)
+        with transaction.atomic():
+            self.fill(options['products'])
+            backends = [('icontains', None)]
+            if fts_available():
+                fts = FTSBackend()
+                fts.rebuild()
+                backends.append(('fts5', fts))
+            inverted = InvertedIndexBackend()
+            started = time.perf_counter()
+            inverted.rebuild()
+            self.stdout.write(f'inverted index built in {time.perf_counter() - started:.2f}s')
+
+            backends.append(('inverted', inverted))
+            self.stdout.write(f"{Product.objects.count()} products, "
+                              f"best of {options['repeat']} runs, milliseconds")
+            self.stdout.write('query'.ljust(22) + ''.join(name.rjust(12) for name, _ in backends))
+            for query in QUERIES:
+                timings = [self.time(query, backend, options['repeat']) for _, backend in backends]
+                self.stdout.write(query.ljust(22) + ''.join(f'{ms:12.2f}' for ms in timings))
+            transaction.set_rollback(True)
+
+    def fill(self, count: int) -> None:
+        '''This function creates the generated products.'''
+        category = Category.objects.create(name='Benchmark')
+        vocabulary = make_vocabulary(5000)
+        batch = []
+        for i in range(count):
+            name = ' '.join([random.choice(WORDS)] + random.sample(vocabulary, 2))
+            description = ' '.join(random.choices(vocabulary, k=18) + random.sample(WORDS, 2))
+            batch.append(Product(name=f'{name} {i}', price=10, category=category,
+                                 description=description, image='uploads/product/benchmark.jpg'))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+
+    def time(self, query: str, backend, repeat: int) -> float:
+        '''This function returns the best time of the work the search view does:
+        the old view loaded every matching product, the new one ranks the matching ids
+        and loads the products of the first page.'''
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            if backend is None:
+                list(Product.objects.filter(
+                    Q(name__icontains=query) | Q(description__icontains=query)))
+            else:
+                Product.objects.in_bulk(backend.search(query)[:24])
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,110 @@
+'''This module contains a benchmark of taking the stock while many orders are placed at once.'''
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from store.inventory import OutOfStock, reserve_stock
+from store.models import Category, Product
+
+
+def read_check_write(product_id: int) -> bool:
+    '''This function takes one product from the stock by reading it,
+    checking it and saving it, without a transaction.'''
+    product = Product.objects.get(id=product_id)
+    if product.stock < 1:
+        return False
+    product.stock -= 1
+    product.save(update_fields=['stock'])
+    return True
+
+
+def locked_read_check_write(product_id: int) -> bool:
+    '''This function does the same as read_check_write in a transaction,
+    with the row locked until the end of the transaction.'''
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(id=product_id)
+        if product.stock < 1:
+            return False
+        product.stock -= 1
+        product.save(update_fields=['stock'])
+        return True
+
+
+def conditional_update(product_id: int) -> bool:
+    '''This function takes one product from the stock with the conditional update.'''
+    try:
+        with transaction.atomic():
+            reserve_stock({product_id: 1})
+        return True
+    except OutOfStock:
+        return False
+
+
+class Command(BaseCommand):
+    '''This class places orders for one product with a small stock from several threads
+    and prints how many were sold, how many more than the stock were sold and the orders per second.
+    The products it creates are deleted at the end.'''
+    help = 'Compares ways of taking the stock while orders are placed at the same time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=400)
+        parser.add_argument('--stock', type=int, default=100)
+
+    def handle(self, *args, **options):
+        category = Category.objects.create(name='Benchmark Stock')
+        try:
+            self.stdout.write(f"{options['orders']} orders from {options['threads']} threads "
+                              f"for a stock of {options['stock']}")
+            self.stdout.write('way'.ljust(24) + 'sold'.rjust(6) + 'oversold'.rjust(10)
+                              + 'errors'.rjust(8) + 'orders/s'.rjust(10))
+            for name, way in [('read-check-write', read_check_write),
+                              ('locked read-check-write', locked_read_check_write),
+                              ('conditional update', conditional_update)]:
+                product = Product.objects.create(name=name, price=10, category=category,
+                                                 stock=options['stock'],
+                                                 image='uploads/product/benchmark.jpg')
+                sold, errors, seconds = self.run(way, product.id, options['threads'],
+                                                 options['orders'])
+                product.refresh_from_db()
+                # with a lost update the stock left doesn't match the products sold
+                oversold = max(sold - options['stock'], sold - (options['stock'] - product.stock))
+                self.stdout.write(name.ljust(24) + f'{sold:6}' + f'{max(oversold, 0):10}'
+                                  + f'{errors:8}' + f"{options['orders'] / seconds:10.0f}")
+        finally:
+            category.delete()
+
+    def run(self, way, product_id: int, threads: int, orders: int) -> tuple:
+        '''This function places the orders from the threads and returns
+        the number of orders that got the product, the errors and the seconds it took.'''
+        lock = threading.Lock()
+        counts = {'sold': 0, 'errors': 0, 'left': orders}
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if counts['left'] == 0:
+                            return
+                        counts['left'] -= 1
+                    try:
+                        got = way(product_id)
+                    except Exception:
+                        got = None
+                    with lock:
+                        if got is None:
+                            counts['errors'] += 1
+                        elif got:
+                            counts['sold'] += 1
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return counts['sold'], counts['errors'], time.perf_counter() - started
@@ -0,0 +1,65 @@
+'''This module contains a benchmark of marking the wishlist products on a listing page.'''
+import time
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from store.models import Category, Product, Wishlist
+from store.wishlist import wishlisted
+
+
+class Command(BaseCommand):
+    '''This class marks the wishlist products of a page of products in three ways:
+    a query per card, one query for the page and the ids kept in the session,
+    and prints the queries and time of each. Everything is rolled back at the end.'''
+    help = 'Compares ways of marking the wishlist products on a listing page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=48)
+        parser.add_argument('--wishlist', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            category = Category.objects.create(name='Benchmark Wishlist')
+            products = Product.objects.bulk_create(
+                Product(name=f'Product {i}', price=10, category=category,
+                        image='uploads/product/benchmark.jpg')
+                for i in range(options['page'] * 2))
+            user = User.objects.create_user('bench-wishlist')
+            Wishlist.objects.bulk_create(Wishlist(user=user, product=product)
+                                         for product in products[::2][:options['wishlist']])
+            page = [product.id for product in products[:options['page']]]
+
+            request = RequestFactory().get('/')
+            request.user = user
+            request.session = SessionStore()
+            # the ids are loaded once per session, not once per page
+            wishlisted(request)
+
+            ways = [
+                ('query per card', lambda: {product_id for product_id in page
+                                            if Wishlist.objects.filter(
+                                                user=user, product_id=product_id).exists()}),
+                ('query per page', lambda: set(Wishlist.objects.filter(
+                    user=user, product_id__in=page).values_list('product_id', flat=True))),
+                ('session ids', lambda: wishlisted(request).intersection(page)),
+            ]
+            expected = ways[0][1]()
+            self.stdout.write(f"{options['page']} products on the page, "
+                              f"{len(expected)} of them in the wishlist")
+            self.stdout.write('way'.ljust(18) + 'queries'.rjust(9) + 'ms'.rjust(10))
+            for name, way in ways:
+                with CaptureQueriesContext(connection) as queries:
+                    marked = way()
+                assert marked == expected, name
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    way()
+                ms = (time.perf_counter() - started) * 1000 / options['repeat']
+                self.stdout.write(name.ljust(18) + f'{len(queries):9}' + f'{ms:10.3f}')
+            transaction.set_rollback(True)
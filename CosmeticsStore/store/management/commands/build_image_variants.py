@@ -0,0 +1,39 @@
+'''This module contains the command that makes the image variants of the existing products.'''
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from store import images
+from store.models import Product
+
+
+class Command(BaseCommand):
+    '''This class makes the resized variants of every product image that has none yet,
+    in a pool of worker processes. With --force the variants are made again for all images.'''
+    help = 'Makes the resized WebP and JPEG variants of the product images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Make the variants again, even if they exist.')
+        parser.add_argument('--workers', type=int, default=None)
+
+    def handle(self, *args, **options):
+        products = Product.objects.only('id', 'image', 'image_variants').iterator(chunk_size=500)
+        jobs = {}
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for product in products:
+                if options['force'] and product.image_variants:
+                    product.image_variants = {}
+                if images.needs_variants(product):
+                    jobs[pool.submit(images.make_variants, *images.job(product))] = product.id
+
+            made = failed = 0
+            for future in as_completed(jobs):
+                try:
+                    images.save_variants(jobs[future], future.result())
+                    made += 1
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'product {jobs[future]}: {error}')
+
+        self.stdout.write(f'Image variants made for {made} products, {failed} failed.')
@@ -0,0 +1,27 @@
+'''This module contains the command that shows how well the product card cache works.'''
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store import cards
+
+
+class Command(BaseCommand):
+    '''This class prints the hits and misses of the product card cache.
+    The counters are kept in the cache, so they are shared by all the processes
+    that use the same cache backend. They only count while CARD_CACHE_STATS is on.'''
+    help = 'Shows the hits and misses of the product card cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Set the counters back to zero after printing them.')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'CARD_CACHE_STATS', False):
+            self.stderr.write('CARD_CACHE_STATS is off, so the counters are not changing.')
+        counts = cards.counters()
+        total = counts['hits'] + counts['misses']
+        ratio = counts['hits'] / total * 100 if total else 0
+        self.stdout.write(f"hits: {counts['hits']}, misses: {counts['misses']}, "
+                          f'hit ratio: {ratio:.1f}%')
+        if options['reset']:
+            cards.reset_counters()
@@ -0,0 +1,14 @@
+'''This module contains the command that counts the product filters again.'''
+from django.core.management.base import BaseCommand
+
+from store import facets
+
+
+class Command(BaseCommand):
+    '''This class recounts the products of every category and price range.
+    It is needed after products are changed without signals, like with bulk_create.'''
+    help = 'Counts the products of every category and price range again.'
+
+    def handle(self, *args, **options):
+        facets.rebuild()
+        self.stdout.write('Product filters recounted.')
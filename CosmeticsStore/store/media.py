@@ -0,0 +1,219 @@
+'''This module contains the storage and the views of the uploaded files (media)
+and of the static files.
+The uploads are kept under a name with a hash of their content, so a file
+never changes under the same name and can be cached by the browser for good.
+The views answer conditional and byte range requests, and the media view can
+leave the copying of the file to the web server (nginx X-Accel-Redirect or Apache X-Sendfile).
+'''
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.http import Http404, HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+
+from .compression import COMPRESSED_EXTENSIONS, SUFFIXES, accepted_encodings
+
+HASH_LENGTH = 12
+CHUNK_SIZE = 64 * 1024
+# a name like 'cream.0f3a9c1b2d4e.png' or the variant 'cream.0f3a9c1b2d4e-320.webp'
+HASHED_NAME = re.compile(r'\.[0-9a-f]{%d}[.-]' % HASH_LENGTH)
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=3600'
+
+
+class HashedMediaStorage(FileSystemStorage):
+    '''This class saves the uploads under their name with the hash of their content added,
+    like 'uploads/product/cream.0f3a9c1b2d4e.png'.
+    A file that is uploaded again is not written a second time.'''
+
+    def hashed_name(self, name: str, content: File) -> str:
+        '''This function returns the name of the file with the hash of its content.'''
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        root, extension = os.path.splitext(name)
+        return f'{root}.{digest.hexdigest()[:HASH_LENGTH]}{extension}'
+
+    def save(self, name: str|None, content, max_length: int|None = None) -> str:
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+def cache_control(path: str) -> str:
+    '''This function returns the Cache-Control of a media file.
+    Only the files with a hash in their name are immutable,
+    the older uploads are revalidated after an hour.'''
+    return IMMUTABLE if HASHED_NAME.search(os.path.basename(path)) else REVALIDATE
+
+
+def byte_range(header: str, size: int) -> tuple|None:
+    '''This function returns the first and last byte of a 'Range: bytes=' header.
+    It returns None for a header that can't be used, so the whole file is sent,
+    and raises ValueError for a range that starts after the end of the file.
+    Several ranges in one request are not supported.'''
+    match = RANGE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # the last bytes of the file
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        raise ValueError(header)
+    return first, last
+
+
+def read_range(path: str, first: int, length: int):
+    '''This generator reads length bytes of the file from the first byte, in chunks.'''
+    with open(path, 'rb') as file:
+        file.seek(first)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def offload(path: str, full_path: str) -> HttpResponse|None:
+    '''This function returns a response that tells the web server to send the file itself,
+    if settings.MEDIA_OFFLOAD is 'x-accel' (nginx) or 'x-sendfile' (Apache, lighttpd).
+    The web server then also handles the ranges.'''
+    mode = getattr(settings, 'MEDIA_OFFLOAD', None)
+    if not mode:
+        return None
+    response = HttpResponse()
+    if mode == 'x-accel':
+        response['X-Accel-Redirect'] = (getattr(settings, 'MEDIA_OFFLOAD_PREFIX', '/protected-media/')
+                                        + quote(path))
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = full_path
+    else:
+        raise ValueError(f'Unknown MEDIA_OFFLOAD: {mode}')
+    # the web server fills in the type and the length
+    del response['Content-Type']
+    return response
+
+
+def find_file(root: str|None, path: str) -> tuple:
+    '''This function returns the full path and the os.stat of a file in the root folder.
+    It raises Http404 if there is no such file or the path leads out of the folder.'''
+    try:
+        if not root:
+            raise OSError(path)
+        full_path = safe_join(root, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('File not found')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+    return full_path, stat
+
+
+def send_file(request: HttpRequest, path: str, full_path: str, stat: os.stat_result,
+              can_offload: bool = False, content_type: str|None = None,
+              encoding: str|None = None) -> HttpResponse:
+    '''This function sends a file. It answers If-None-Match and If-Modified-Since
+    with 304 and a Range with 206, and lets the web server copy the file
+    when that is turned on and can_offload is True.'''
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    headers = {'ETag': etag, 'Last-Modified': http_date(last_modified),
+               'Cache-Control': cache_control(path)}
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None and can_offload:
+        response = offload(path, full_path)
+    if response is not None:
+        for key, value in headers.items():
+            response.headers.setdefault(key, value)
+        return response
+
+    size = stat.st_size
+    first, last = 0, size - 1
+    status = 200
+    range_header = request.headers.get('Range')
+    if range_header and request.method == 'GET' and _if_range(request, etag, last_modified):
+        try:
+            found = byte_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if found is not None:
+            first, last = found
+            status = 206
+
+    if content_type is None:
+        content_type, encoding = mimetypes.guess_type(full_path)
+    response = StreamingHttpResponse(read_range(full_path, first, last - first + 1),
+                                     status=status,
+                                     content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(last - first + 1)
+    response['Accept-Ranges'] = 'bytes'
+    if status == 206:
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    for key, value in headers.items():
+        response[key] = value
+    return response
+
+
+def serve_media(request: HttpRequest, path: str) -> HttpResponse:
+    '''This function sends an uploaded file.'''
+    full_path, stat = find_file(settings.MEDIA_ROOT, path)
+    return send_file(request, path, full_path, stat, can_offload=True)
+
+
+def serve_static(request: HttpRequest, path: str) -> HttpResponse:
+    '''This function sends a file collected by collectstatic.
+    If the browser accepts brotli or gzip and collectstatic made a compressed copy
+    of the file, the copy is sent, so nothing is compressed while answering.'''
+    full_path, stat = find_file(settings.STATIC_ROOT, path)
+    content_type = mimetypes.guess_type(full_path)[0]
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    for encoding, suffix in SUFFIXES.items():
+        if encoding in accepted and os.path.isfile(full_path + suffix):
+            response = send_file(request, path, full_path + suffix, os.stat(full_path + suffix),
+                                 content_type=content_type, encoding=encoding)
+            break
+    else:
+        response = send_file(request, path, full_path, stat)
+    if path.endswith(COMPRESSED_EXTENSIONS):
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _if_range(request: HttpRequest, etag: str, last_modified: int) -> bool:
+    '''This function tells if the Range can be used: without If-Range,
+    or with an If-Range that matches the file as it is now.'''
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
@@ -0,0 +1,73 @@
+'''This module contains the middleware that compresses the pages of the store.'''
+import secrets
+from itertools import chain
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.crypto import get_random_string
+
+from .compression import StreamCompressor, available_encodings, choose_encoding
+
+COMPRESSED_TYPES = ('text/html', 'application/json')
+BROTLI_LEVEL = 5
+
+
+class CompressionMiddleware(GZipMiddleware):
+    '''This class compresses the HTML and JSON responses.
+    gzip is done by Django's GZipMiddleware, which adds random bytes to every
+    response against the BREACH attack. When brotli is installed and the browser
+    prefers it, the HTML pages are compressed with brotli instead, with a comment
+    of random length at the end for the same reason. Responses smaller than
+    COMPRESS_MIN_SIZE bytes and responses that are already encoded are left alone.'''
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        if (response.has_header('Content-Encoding')
+                or not response.get('Content-Type', '').startswith(COMPRESSED_TYPES)):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESS_MIN_SIZE:
+            return response
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'), available_encodings())
+        if encoding is None:
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+        if (encoding == 'gzip' or (response.streaming and response.is_async)
+                or not response['Content-Type'].startswith('text/html')):
+            return super().process_response(request, response)
+        return self.brotli_response(response)
+
+    def brotli_response(self, response: HttpResponse) -> HttpResponse:
+        '''This function compresses an HTML response with brotli.
+        A streaming response is compressed piece by piece, so it stays streaming.'''
+        patch_vary_headers(response, ('Accept-Encoding',))
+        padding = f'<!-- {get_random_string(secrets.randbelow(self.max_random_bytes) + 1)} -->'
+        compressor = StreamCompressor('br', BROTLI_LEVEL)
+        if response.streaming:
+            response.streaming_content = self.compress_stream(
+                compressor, chain(response.streaming_content, [padding.encode()]))
+            del response['Content-Length']
+        else:
+            compressed = compressor.compress(response.content + padding.encode()) \
+                + compressor.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # the compressed body is not byte for byte the one the ETag was made for
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = 'br'
+        return response
+
+    @staticmethod
+    def compress_stream(compressor: StreamCompressor, content):
+        '''This generator compresses a streaming response piece by piece.'''
+        for piece in content:
+            compressed = compressor.compress(piece)
+            if compressed:
+                yield compressed
+        yield compressor.finish()
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_wishlist'),
+        ('cart', '0002_copy_last_cart'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='profile',
+            name='last_cart',
+        ),
+    ]
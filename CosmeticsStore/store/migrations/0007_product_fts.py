@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:10
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_fts_table(apps, schema_editor):
+    '''Creates the FTS5 search table and indexes the existing products.
+    Without SQLite FTS5 nothing is created and the in-memory index is used.'''
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE store_product_fts USING fts5("
+            "name, description, tokenize='unicode61 remove_diacritics 2')")
+    except OperationalError:
+        return
+    schema_editor.execute(
+        "INSERT INTO store_product_fts (rowid, name, description) "
+        "SELECT id, name, COALESCE(description, '') FROM store_product")
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS store_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_remove_profile_last_cart'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
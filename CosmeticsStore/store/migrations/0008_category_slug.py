@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:02
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def fill_slugs(apps, schema_editor):
+    '''Gives every existing category a unique slug made from its name.'''
+    Category = apps.get_model('store', 'Category')
+    used = set()
+    for category in Category.objects.order_by('id'):
+        slug = slugify(category.name) or str(category.id)
+        if slug in used:
+            slug = f'{slug}-{category.id}'
+        used.add(slug)
+        category.slug = slug
+        category.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_product_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(max_length=60, null=True),
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(max_length=60, unique=True),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:44
+
+from django.db import migrations, models
+
+PRICE_RANGES = [('0-20', 0, 20), ('20-50', 20, 50), ('50-100', 50, 100), ('100-', 100, None)]
+
+
+def count_facets(apps, schema_editor):
+    '''Counts the existing products for every category and price range.'''
+    Product = apps.get_model('store', 'Product')
+    FacetCount = apps.get_model('store', 'FacetCount')
+    counts = {}
+    for category_id, price in Product.objects.values_list('category_id', 'price'):
+        key = ('category', str(category_id))
+        counts[key] = counts.get(key, 0) + 1
+        for value, low, high in PRICE_RANGES:
+            if price >= low and (high is None or price < high):
+                counts[('price', value)] = counts.get(('price', value), 0) + 1
+                break
+    FacetCount.objects.bulk_create(
+        FacetCount(facet=facet, value=value, count=count)
+        for (facet, value), count in counts.items())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_category_slug'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='price',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=6),
+        ),
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('facet', 'value'), name='unique_facet_value')],
+            },
+        ),
+        migrations.RunPython(count_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:40
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    '''Keeps only the first row of every product that is in a wishlist more than once.'''
+    Wishlist = apps.get_model('store', 'Wishlist')
+    first_rows = (Wishlist.objects.values('user_id', 'product_id')
+                  .annotate(first=Min('id')).values_list('first', flat=True))
+    Wishlist.objects.exclude(id__in=list(first_rows)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='wishlist',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_wishlist_product'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_wishlist_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
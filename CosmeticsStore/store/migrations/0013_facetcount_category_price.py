@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:20
+
+from django.db import migrations
+
+PRICE_RANGES = [('0-20', 0, 20), ('20-50', 20, 50), ('50-100', 50, 100), ('100-', 100, None)]
+
+
+def count_category_prices(apps, schema_editor):
+    '''Counts the existing products for every price range within every category.'''
+    Product = apps.get_model('store', 'Product')
+    FacetCount = apps.get_model('store', 'FacetCount')
+    counts = {}
+    for category_id, price in Product.objects.values_list('category_id', 'price'):
+        for value, low, high in PRICE_RANGES:
+            if price >= low and (high is None or price < high):
+                key = f'{category_id}:{value}'
+                counts[key] = counts.get(key, 0) + 1
+                break
+    FacetCount.objects.bulk_create(
+        FacetCount(facet='category_price', value=value, count=count)
+        for value, count in counts.items())
+
+
+def remove_category_prices(apps, schema_editor):
+    FacetCount = apps.get_model('store', 'FacetCount')
+    FacetCount.objects.filter(facet='category_price').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_product_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_category_prices, remove_category_prices),
+    ]
@@ -3,6 +3,7 @@ import datetime
 from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
+from django.utils.text import slugify
 
 
 class Profile(models.Model):
@@ -16,9 +17,6 @@ class Profile(models.Model):
     zipcode = models.CharField(max_length=20, blank=True)
     country = models.CharField(max_length=20, blank=True)
 
-
-    last_cart = models.CharField(max_length=20, blank=True, null=True)
-
     def __str__(self):
         return self.user.username
 
@@ -33,12 +31,31 @@ def create_profile(sender, instance, created: bool, **kwargs):
 post_save.connect(create_profile, sender = User)
 
 class Category(models.Model):
-    '''This class contains the model of the categories of the products.'''
+    '''This class contains the model of the categories of the products.
+    The slug is used in the link of the category page.'''
     name = models.CharField(max_length=50)
+    slug = models.SlugField(max_length=60, unique=True)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs) -> None:
+        if not self.slug:
+            self.slug = self.unique_slug()
+        super().save(*args, **kwargs)
+
+    def unique_slug(self) -> str:
+        '''This function makes a slug from the name that no other category has.
+        A name without latin letters or digits gives the id (or 'category' before the
+        first save), and a slug that is taken gets a -2, -3, ... suffix.'''
+        base = slugify(self.name)[:50].strip('-') or (str(self.id) if self.id else 'category')
+        taken = set(Category.objects.filter(slug__startswith=base).exclude(pk=self.pk)
+                    .values_list('slug', flat=True))
+        slug, number = base, 2
+        while slug in taken:
+            slug, number = f'{base}-{number}', number + 1
+        return slug
+
     class Meta:
         verbose_name_plural = 'categories'
 
@@ -59,15 +76,44 @@ class Customer(models.Model):
 class Product(models.Model):
     '''This class contains the model of every product in our site.'''
     name = models.CharField(max_length=50)
-    price = models.DecimalField(default=0, decimal_places=2, max_digits=6)
+    price = models.DecimalField(default=0, decimal_places=2, max_digits=6, db_index=True)
 
     category = models.ForeignKey(Category, on_delete=models.CASCADE, default=1)
     description = models.CharField(max_length=500, default='', blank=True, null=True)
     image = models.ImageField(upload_to='uploads/product/')
+    # how many are left, empty if the stock of the product is not counted
+    stock = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    # the resized copies of the image, made by store.images after the product is saved
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        '''This function keeps the values the product was loaded with,
+        so a change can be seen on save without reading the row again.'''
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_values = dict(zip(field_names, values))
+        return instance
+
+class FacetCount(models.Model):
+    '''This class contains the number of products for one value of a filter,
+    like one category, one price range or one price range within a category. The counts are changed
+    when a product is saved or deleted, so the filters never count the whole catalog.'''
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='unique_facet_value'),
+        ]
+
+    def __str__(self):
+        return f'{self.facet}={self.value}: {self.count}'
+
+
 class Order(models.Model):
     '''This class contains the model of every order made in our site.'''
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -82,6 +128,12 @@ class Order(models.Model):
         return self.product
 
 class Wishlist(models.Model):
-    '''This class contains the model of the customer's wishlist.'''
+    '''This class contains the model of the customer's wishlist.
+    A product is in the wishlist of a user at most once.'''
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_wishlist_product'),
+        ]
@@ -0,0 +1,144 @@
+'''This module contains the keyset pagination used by the product listings.'''
+import datetime
+
+from django.db.models import Q
+from django.http import QueryDict
+
+PAGE_SIZE = 24
+
+
+class KeysetPage():
+    '''This class contains one page of a listing and the links to the other pages.
+    A page starts after the id of the last row of the page before it, instead of an offset,
+    so a deep page costs the same as the first one
+    and products added in the meantime don't move rows between pages.'''
+
+    def __init__(self, object_list: list, after: int|str|None, next_after: int|str|None,
+                 params: QueryDict) -> None:
+        self.object_list = object_list
+        self.after = after
+        self.next_after = next_after
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __bool__(self) -> bool:
+        return bool(self.object_list)
+
+    def has_previous(self) -> bool:
+        '''This function tells if this is not the first page.'''
+        return self.after is not None
+
+    def has_next(self) -> bool:
+        '''This function tells if there is a page after this one.'''
+        return self.next_after is not None
+
+    def next_query(self) -> str:
+        '''This function returns the query string of the next page.'''
+        params = self.params.copy()
+        params['after'] = self.next_after
+        return params.urlencode()
+
+    def first_query(self) -> str:
+        '''This function returns the query string of the first page.'''
+        params = self.params.copy()
+        params.pop('after', None)
+        return params.urlencode()
+
+
+def paginate(queryset, params: QueryDict, page_size: int = PAGE_SIZE) -> KeysetPage:
+    '''This function returns the page of the queryset that starts after
+    the id given in the 'after' parameter, ordered by id.
+    It runs a single query that reads one row more than the page
+    to know if there is a next page.'''
+    try:
+        after = int(params.get('after'))
+    except (TypeError, ValueError):
+        after = None
+
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    rows = list(queryset.order_by('id')[:page_size + 1])
+
+    next_after = rows[page_size - 1].id if len(rows) > page_size else None
+    return KeysetPage(rows[:page_size], after, next_after, params)
+
+
+def paginate_newest(queryset, params: QueryDict, field: str,
+                    page_size: int = PAGE_SIZE) -> KeysetPage:
+    '''This function returns the page of the queryset that starts after
+    the row given in the 'after' parameter, newest first by the date field and then by id.
+    The parameter has the date and the id of the last row of the page before,
+    so the query can use an index on the date field.'''
+    after = params.get('after')
+    try:
+        date, row_id = after.rsplit('_', 1)
+        date, row_id = datetime.datetime.fromisoformat(date), int(row_id)
+    except (AttributeError, ValueError):
+        after = None
+
+    if after is not None:
+        queryset = queryset.filter(Q(**{f'{field}__lt': date})
+                                   | Q(**{field: date, 'id__lt': row_id}))
+    rows = list(queryset.order_by(f'-{field}', '-id')[:page_size + 1])
+
+    next_after = None
+    if len(rows) > page_size:
+        last = rows[page_size - 1]
+        next_after = f'{getattr(last, field).isoformat()}_{last.id}'
+    return KeysetPage(rows[:page_size], after, next_after, params)
+
+
+class RankedPage():
+    '''This class contains one page of a ranked list of product ids,
+    like the search results. The ids are already in memory,
+    so only the products of the page are loaded, with one query.'''
+
+    def __init__(self, queryset, ids: list, params: QueryDict,
+                 page_size: int = PAGE_SIZE) -> None:
+        try:
+            self.number = max(int(params.get('page')), 1)
+        except (TypeError, ValueError):
+            self.number = 1
+        self.params = params
+        self.total = len(ids)
+
+        start = (self.number - 1) * page_size
+        page_ids = ids[start:start + page_size]
+        products = queryset.in_bulk(page_ids)
+        self.object_list = [products[product_id] for product_id in page_ids
+                            if product_id in products]
+        self.next_number = self.number + 1 if start + page_size < len(ids) else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __bool__(self) -> bool:
+        return bool(self.object_list)
+
+    def has_previous(self) -> bool:
+        '''This function tells if this is not the first page.'''
+        return self.number > 1
+
+    def has_next(self) -> bool:
+        '''This function tells if there is a page after this one.'''
+        return self.next_number is not None
+
+    def next_query(self) -> str:
+        '''This function returns the query string of the next page.'''
+        params = self.params.copy()
+        params['page'] = self.next_number
+        return params.urlencode()
+
+    def first_query(self) -> str:
+        '''This function returns the query string of the first page.'''
+        params = self.params.copy()
+        params.pop('page', None)
+        return params.urlencode()
@@ -0,0 +1,192 @@
+'''This module contains the full-text search of the products.
+On SQLite with FTS5 the products are kept in the store_product_fts table,
+otherwise an inverted index is kept in the memory of the process.
+'''
+import re
+import threading
+from bisect import bisect_left, insort
+
+from django.db import connection, transaction
+
+from .models import Product
+
+FTS_TABLE = 'store_product_fts'
+# a match in the name counts more than a match in the description
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+MAX_RESULTS = 1000
+
+
+def tokenize(text: str) -> list:
+    '''This function splits a text into lowercase words.'''
+    return re.findall(r'\w+', (text or '').lower())
+
+
+class FTSBackend():
+    '''This class searches the products with the SQLite FTS5 table.
+    Every word of the query is matched as a prefix and the results
+    are ranked with bm25.'''
+    # the index is a table, so it is changed in the transaction of the product
+    in_database = True
+
+    def index(self, product: Product) -> None:
+        '''This function adds or replaces a product in the index.'''
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.id])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+                [product.id, product.name, product.description or ''])
+
+    def remove(self, product_id: int) -> None:
+        '''This function removes a product from the index.'''
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+    def rebuild(self) -> None:
+        '''This function indexes all the products again.'''
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+                f'SELECT id, name, COALESCE(description, \'\') FROM store_product')
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> list:
+        '''This function returns the ids of the matching products, best match first.'''
+        words = tokenize(query)
+        if not words:
+            return []
+        match = ' '.join(f'"{word}"*' for word in words)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s',
+                [match, NAME_WEIGHT, DESCRIPTION_WEIGHT, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndexBackend():
+    '''This class searches the products with an inverted index kept in memory.
+    It is used when the database has no FTS5. The words are kept sorted,
+    so a prefix is found with a binary search. The index is built on the first search
+    and kept up to date by the Product signals of this process.'''
+    # the index is in memory, so it is only changed once the transaction is committed
+    in_database = False
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.words = []
+        self.postings = {}
+        self.documents = {}
+
+    def _add(self, product_id: int, name: str, description: str) -> None:
+        weights = {}
+        for word in tokenize(name):
+            weights[word] = weights.get(word, 0) + NAME_WEIGHT
+        for word in tokenize(description):
+            weights[word] = weights.get(word, 0) + DESCRIPTION_WEIGHT
+
+        for word, weight in weights.items():
+            if word not in self.postings:
+                self.postings[word] = {}
+                insort(self.words, word)
+            self.postings[word][product_id] = weight
+        self.documents[product_id] = set(weights)
+
+    def _remove(self, product_id: int) -> None:
+        for word in self.documents.pop(product_id, ()):
+            posting = self.postings[word]
+            posting.pop(product_id, None)
+            if not posting:
+                del self.postings[word]
+                del self.words[bisect_left(self.words, word)]
+
+    def _load(self) -> None:
+        if not self.loaded:
+            rows = Product.objects.values_list('id', 'name', 'description').iterator(chunk_size=2000)
+            for product_id, name, description in rows:
+                self._add(product_id, name, description)
+            self.loaded = True
+
+    def index(self, product: Product) -> None:
+        '''This function adds or replaces a product in the index.'''
+        with self.lock:
+            if self.loaded:
+                self._remove(product.id)
+                self._add(product.id, product.name, product.description)
+
+    def remove(self, product_id: int) -> None:
+        '''This function removes a product from the index.'''
+        with self.lock:
+            self._remove(product_id)
+
+    def rebuild(self) -> None:
+        '''This function indexes all the products again.'''
+        with self.lock:
+            self.loaded = False
+            self.words, self.postings, self.documents = [], {}, {}
+            self._load()
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> list:
+        '''This function returns the ids of the matching products, best match first.
+        A product matches if every word of the query is the prefix of one of its words.'''
+        scores = None
+        with self.lock:
+            self._load()
+            for word in tokenize(query):
+                matches = {}
+                position = bisect_left(self.words, word)
+                while position < len(self.words) and self.words[position].startswith(word):
+                    for product_id, weight in self.postings[self.words[position]].items():
+                        matches[product_id] = matches.get(product_id, 0) + weight
+                    position += 1
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {product_id: scores[product_id] + weight
+                              for product_id, weight in matches.items() if product_id in scores}
+
+        if not scores:
+            return []
+        return sorted(scores, key=lambda product_id: (-scores[product_id], product_id))[:limit]
+
+
+_backend = None
+
+
+def fts_available() -> bool:
+    '''This function tells if the FTS5 table was created by the migrations.'''
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def get_backend():
+    '''This function returns the search backend, chosen the first time it is needed.'''
+    global _backend
+    if _backend is None:
+        _backend = FTSBackend() if fts_available() else InvertedIndexBackend()
+    return _backend
+
+
+def search_products(query: str, limit: int = MAX_RESULTS) -> list:
+    '''This function returns the ids of the products matching the query, best match first.'''
+    return get_backend().search(query, limit)
+
+
+def product_saved(sender, instance: Product, **kwargs) -> None:
+    '''This function keeps the search index up to date when a product is saved.'''
+    backend = get_backend()
+    if backend.in_database:
+        backend.index(instance)
+    else:
+        product = Product(id=instance.id, name=instance.name, description=instance.description)
+        transaction.on_commit(lambda: backend.index(product))
+
+
+def product_deleted(sender, instance: Product, **kwargs) -> None:
+    '''This function removes a deleted product from the search index.'''
+    backend = get_backend()
+    if backend.in_database:
+        backend.remove(instance.id)
+    else:
+        product_id = instance.id
+        transaction.on_commit(lambda: backend.remove(product_id))
@@ -0,0 +1,36 @@
+'''This module connects the functions that keep the indexes
+and caches of the store up to date when the products change.'''
+from django.db.models.signals import post_save, post_delete, pre_save
+
+from . import cards, catalog, conditional, facets, images, inventory, search, suggest
+from .models import Category, Product
+
+
+post_save.connect(search.product_saved, sender = Product)
+post_delete.connect(search.product_deleted, sender = Product)
+post_save.connect(suggest.product_saved, sender = Product)
+post_delete.connect(suggest.product_deleted, sender = Product)
+post_save.connect(suggest.category_saved, sender = Category)
+post_delete.connect(suggest.category_deleted, sender = Category)
+
+post_save.connect(catalog.catalog_changed, sender = Product)
+post_delete.connect(catalog.catalog_changed, sender = Product)
+post_save.connect(catalog.catalog_changed, sender = Category)
+post_delete.connect(catalog.catalog_changed, sender = Category)
+
+pre_save.connect(facets.product_before_save, sender = Product)
+post_save.connect(facets.product_saved, sender = Product)
+post_delete.connect(facets.product_deleted, sender = Product)
+
+post_save.connect(conditional.catalog_changed, sender = Product)
+post_delete.connect(conditional.catalog_changed, sender = Product)
+post_save.connect(conditional.catalog_changed, sender = Category)
+post_delete.connect(conditional.catalog_changed, sender = Category)
+
+post_save.connect(cards.product_changed, sender = Product)
+post_delete.connect(cards.product_changed, sender = Product)
+post_save.connect(cards.category_changed, sender = Category)
+
+post_save.connect(images.product_saved, sender = Product)
+
+post_save.connect(inventory.product_saved, sender = Product)
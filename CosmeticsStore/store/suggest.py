@@ -0,0 +1,143 @@
+'''This module contains the prefix index used to suggest products
+and categories while the customer types in the search box.'''
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.db import transaction
+from django.urls import reverse
+
+from .models import Category, Product
+
+MAX_SUGGESTIONS = 8
+
+
+def normalize(text: str) -> str:
+    '''This function lowercases a text, removes its accents and extra spaces.'''
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+class PrefixIndex():
+    '''This class keeps the names of the products and categories in a sorted list.
+    Every name is added once from each of its words, so "ser" finds "Hyaluronic Serum".
+    A lookup is a binary search, so it doesn't touch the database.
+    The index is loaded on the first lookup and then changed one name at a time
+    by the Product and Category signals.'''
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.keys = []
+        self.entries = {}
+
+    def _add(self, kind: str, object_id: int, name: str, url: str, keep_sorted=True) -> None:
+        words = normalize(name).split()
+        keys = [(' '.join(words[i:]), kind, object_id) for i in range(len(words))]
+        for key in keys:
+            if keep_sorted:
+                insort(self.keys, key)
+            else:
+                self.keys.append(key)
+        self.entries[(kind, object_id)] = (name, url, keys)
+
+    def _remove(self, kind: str, object_id: int) -> None:
+        entry = self.entries.pop((kind, object_id), None)
+        if entry is not None:
+            for key in entry[2]:
+                del self.keys[bisect_left(self.keys, key)]
+
+    def _load(self) -> None:
+        if not self.loaded:
+            for category in Category.objects.all():
+                self._add('category', category.id, category.name, category_url(category),
+                          keep_sorted=False)
+            for product_id, name in Product.objects.values_list('id', 'name').iterator():
+                self._add('product', product_id, name, reverse('product', args=[product_id]),
+                          keep_sorted=False)
+            self.keys.sort()
+            self.loaded = True
+
+    def reset(self) -> None:
+        '''This function empties the index, so it is loaded again on the next lookup.'''
+        with self.lock:
+            self.loaded = False
+            self.keys = []
+            self.entries = {}
+
+    def set(self, kind: str, object_id: int, name: str, url: str) -> None:
+        '''This function adds or replaces a name in the index.'''
+        with self.lock:
+            if self.loaded:
+                self._remove(kind, object_id)
+                self._add(kind, object_id, name, url)
+
+    def remove(self, kind: str, object_id: int) -> None:
+        '''This function removes a name from the index.'''
+        with self.lock:
+            self._remove(kind, object_id)
+
+    def suggest(self, prefix: str, limit: int = MAX_SUGGESTIONS) -> list:
+        '''This function returns the names that have a word starting with the prefix,
+        categories first.'''
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        found = {}
+        with self.lock:
+            self._load()
+            position = bisect_left(self.keys, (prefix,))
+            while position < len(self.keys) and self.keys[position][0].startswith(prefix):
+                _, kind, object_id = self.keys[position]
+                found.setdefault((kind, object_id), self.entries[(kind, object_id)])
+                if len(found) >= limit * 4:
+                    break
+                position += 1
+
+        suggestions = [{'label': name, 'kind': kind, 'url': url}
+                       for (kind, _), (name, url, _) in found.items()]
+        suggestions.sort(key=lambda suggestion: (suggestion['kind'] != 'category',
+                                                 suggestion['label'].lower()))
+        return suggestions[:limit]
+
+
+def category_url(category: Category) -> str:
+    '''This function returns the link to the page of a category.'''
+    return reverse('category', args=[category.slug])
+
+
+index = PrefixIndex()
+
+
+def suggest(prefix: str) -> list:
+    '''This function returns the suggestions for what was typed in the search box.'''
+    return index.suggest(prefix)
+
+# the index is in memory, so it is only changed once the change is committed
+
+def product_saved(sender, instance: Product, **kwargs) -> None:
+    '''This function keeps the suggestions up to date when a product is saved.'''
+    product_id, name = instance.id, instance.name
+    url = reverse('product', args=[product_id])
+    transaction.on_commit(lambda: index.set('product', product_id, name, url))
+
+
+def product_deleted(sender, instance: Product, **kwargs) -> None:
+    '''This function removes a deleted product from the suggestions.'''
+    product_id = instance.id
+    transaction.on_commit(lambda: index.remove('product', product_id))
+
+
+def category_saved(sender, instance: Category, **kwargs) -> None:
+    '''This function keeps the suggestions up to date when a category is saved.'''
+    category_id, name = instance.id, instance.name
+    url = category_url(instance)
+    transaction.on_commit(lambda: index.set('category', category_id, name, url))
+
+
+def category_deleted(sender, instance: Category, **kwargs) -> None:
+    '''This function removes a deleted category from the suggestions.'''
+    category_id = instance.id
+    transaction.on_commit(lambda: index.remove('category', category_id))
@@ -0,0 +1,39 @@
+'''This module contains the template tag that shows a product image
+with its resized variants, so the browser downloads the smallest one that fits.'''
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+# the cards are in 2 columns on phones, 3 on tablets and 4 on large screens
+CARD_SIZES = '(min-width: 1200px) 25vw, (min-width: 768px) 33vw, 50vw'
+
+
+@register.simple_tag
+def product_image(product, css_class: str = '', sizes: str = CARD_SIZES, lazy: bool = True,
+                  alt: str = '...') -> str:
+    '''This tag returns a <picture> with the WebP and JPEG variants of the product image
+    in srcset, the tiny placeholder as background and loading="lazy".
+    If the variants are not made yet, the original image is shown.'''
+    loading = 'lazy' if lazy else 'eager'
+    variants = product.image_variants or {}
+    if variants.get('source') != product.image.name or not variants.get('jpeg'):
+        return format_html('<img src="{}" class="{}" alt="{}" loading="{}" decoding="async">',
+                           product.image.url, css_class, alt, loading)
+
+    storage = product.image.storage
+
+    def srcset(key: str) -> str:
+        return ', '.join(f'{storage.url(name)} {width}w' for width, name in variants[key])
+
+    largest, fallback = variants['jpeg'][-1]
+    height = round(variants['height'] * largest / variants['width'])
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" alt="{}" '
+        'loading="{}" decoding="async" '
+        'style="background: url({}) center / cover no-repeat; height: auto;">'
+        '</picture>',
+        srcset('webp'), sizes, storage.url(fallback), srcset('jpeg'), sizes,
+        largest, height, css_class, alt, loading, variants['placeholder'])
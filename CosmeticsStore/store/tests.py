@@ -1,3 +1,620 @@
-from django.test import TestCase
+'''This module contains the tests of the store.'''
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import closing
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .models import Category, Product, Wishlist
+from . import cards, catalog, facets, images, media, search, suggest
+from .compression import brotli
+from .conditional import bump_catalog_version
+from .search import FTSBackend, InvertedIndexBackend, search_products
+from .wishlist import add_to_wishlist
+
+
+def has_fts5() -> bool:
+    '''This function tells if the SQLite of this Python can make FTS5 tables.'''
+    if connection.vendor != 'sqlite':
+        return False
+    with closing(sqlite3.connect(':memory:')) as probe:
+        try:
+            probe.execute('CREATE VIRTUAL TABLE probe USING fts5(text)')
+        except sqlite3.OperationalError:
+            return False
+    return True
+
+
+class SearchTest(TestCase):
+    '''This class tests the full-text search of the products.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Serums')
+        cls.serum = Product.objects.create(
+            name='Hyaluronic Serum', price=20, category=category,
+            description='A light serum', image='uploads/product/test.jpg')
+        cls.toner = Product.objects.create(
+            name='Calming Toner', price=15, category=category,
+            description='Toner with hyaluronic acid', image='uploads/product/test.jpg')
+
+    def setUp(self):
+        cache.clear()
+
+    def check_backend(self, backend):
+        '''This function checks prefix matching and ranking of a backend.'''
+        # a match in the name ranks before a match in the description
+        self.assertEqual(backend.search('hyal'), [self.serum.id, self.toner.id])
+        self.assertEqual(backend.search('calm hyaluronic'), [self.toner.id])
+        self.assertEqual(backend.search('retinol'), [])
+
+    @skipUnless(has_fts5(), 'SQLite has no FTS5')
+    def test_fts(self):
+        self.check_backend(FTSBackend())
+
+    def test_inverted_index(self):
+        self.check_backend(InvertedIndexBackend())
+
+    def test_index_follows_saves_and_deletes(self):
+        self.serum.name = 'Vitamin Serum'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.serum.save()
+        self.assertEqual(search_products('vitamin'), [self.serum.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.toner.delete()
+        self.assertEqual(search_products('hyaluronic'), [])
+
+    def test_inverted_index_ignores_rolled_back_changes(self):
+        backend = InvertedIndexBackend()
+        expected = backend.search('hyal')
+        with mock.patch.object(search, '_backend', backend):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.serum.name = 'Vitamin Serum'
+                self.serum.save()
+                self.toner.delete()
+                raise RuntimeError('rolled back')
+            self.assertEqual(backend.search('vitamin'), [])
+            self.assertEqual(backend.search('hyal'), expected)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.serum.save()
+            self.assertEqual(backend.search('vitamin'), [self.serum.id])
+
+    def test_search_page(self):
+        response = self.client.get('/search/', {'q': 'toner'})
+        self.assertContains(response, 'Calming Toner')
+        self.assertNotContains(response, 'Hyaluronic Serum')
+
+
+class SuggestTest(TestCase):
+    '''This class tests the search-as-you-type suggestions.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Sun Protection')
+        cls.product = Product.objects.create(
+            name='Ultra Gel Sunscreen', price=30, category=cls.category,
+            image='uploads/product/test.jpg')
+
+    def setUp(self):
+        suggest.index.reset()
+
+    def test_suggestions_without_queries(self):
+        self.client.get('/search/suggest', {'q': 'sun'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/search/suggest', {'q': 'SUN'})
+
+        labels = [suggestion['label'] for suggestion in response.json()['suggestions']]
+        self.assertEqual(labels, ['Sun Protection', 'Ultra Gel Sunscreen'])
+
+    def test_index_follows_saves(self):
+        self.client.get('/search/suggest', {'q': 'x'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Ultra Gel Cream'
+            self.product.save()
+
+        self.assertEqual(suggest.suggest('sunscreen'), [])
+        self.assertEqual([s['label'] for s in suggest.suggest('crea')], ['Ultra Gel Cream'])
+
+
+class CategoryTest(TestCase):
+    '''This class tests the category pages and the category cache.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Sun Protection')
+        Product.objects.create(name='Ultra Gel Sunscreen', price=30, category=cls.category,
+                               image='uploads/product/test.jpg')
+
+    def setUp(self):
+        cache.clear()
+        catalog.clear()
+        facets.clear()
+
+    def test_slug_is_made_from_the_name(self):
+        self.assertEqual(self.category.slug, 'sun-protection')
+        self.assertEqual(Category.objects.create(name='Sun Protection').slug, 'sun-protection-2')
+        self.assertEqual(Category.objects.create(name='Sun  protection').slug, 'sun-protection-3')
+        self.assertEqual(Category.objects.create(name='Кремове').slug, 'category')
+        self.assertEqual(Category.objects.create(name='Серуми').slug, 'category-2')
+
+    def test_category_page_queries_only_products(self):
+        self.client.get('/category/sun-protection')
+        with self.assertNumQueries(1):
+            response = self.client.get('/category/sun-protection')
+        self.assertContains(response, 'Ultra Gel Sunscreen')
+
+    def test_summary_and_menu_from_cache(self):
+        catalog.categories()
+        with self.assertNumQueries(0):
+            response = self.client.get('/category_summary/')
+        self.assertContains(response, '(1)')
+        self.assertContains(response, 'href="/category/sun-protection"', count=2)
+
+    def test_change_in_another_process_is_seen(self):
+        catalog.categories()
+        # a category added by another process: only the catalog version changes here
+        Category.objects.create(name='Night Care')
+        self.assertIsNone(catalog.category_by_slug('night-care'))
+        bump_catalog_version()
+        self.assertEqual(catalog.category_by_slug('night-care').name, 'Night Care')
+        self.assertContains(self.client.get('/category_summary/'), 'Night Care')
+
+    def test_old_link_redirects(self):
+        response = self.client.get('/category/Sun-Protection')
+        self.assertRedirects(response, '/category/sun-protection', status_code=301)
+
+
+class FacetTest(TestCase):
+    '''This class tests the category and price filters and their counts.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.serums = Category.objects.create(name='Serums')
+        cls.toners = Category.objects.create(name='Toners')
+        cls.serum = Product.objects.create(name='Cheap Serum', price=10, category=cls.serums,
+                                           image='uploads/product/test.jpg')
+        Product.objects.create(name='Dear Serum', price=60, category=cls.serums,
+                               image='uploads/product/test.jpg')
+
+    def setUp(self):
+        cache.clear()
+        catalog.clear()
+        facets.clear()
+
+    def counts(self) -> dict:
+        '''This function returns the counts that are not zero.'''
+        return {key: count for key, count in facets.facet_counts().items() if count}
+
+    def test_counts_follow_saves(self):
+        self.assertEqual(self.counts(), {('category', str(self.serums.id)): 2,
+                                         ('price', '0-20'): 1, ('price', '50-100'): 1,
+                                         ('category_price', f'{self.serums.id}:0-20'): 1,
+                                         ('category_price', f'{self.serums.id}:50-100'): 1})
+
+        product = Product.objects.get(id=self.serum.id)
+        product.category = self.toners
+        product.price = 25
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+            product.delete()
+
+        self.assertEqual(self.counts(), {('category', str(self.serums.id)): 1,
+                                         ('price', '50-100'): 1,
+                                         ('category_price', f'{self.serums.id}:50-100'): 1})
+
+    def test_change_in_another_process_is_seen(self):
+        before = facets.facet_counts()[('price', '0-20')]
+        # a product saved by another process: the counts in the database change
+        # and so does the catalog version, but nothing is cleared here
+        facets.change_count('price', '0-20', 1)
+        self.assertEqual(facets.facet_counts()[('price', '0-20')], before)
+        bump_catalog_version()
+        self.assertEqual(facets.facet_counts()[('price', '0-20')], before + 1)
+
+    def test_rebuild_gives_same_counts(self):
+        before = self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            facets.rebuild()
+        self.assertEqual(self.counts(), before)
+
+    def test_category_page_counts_its_own_prices(self):
+        Product.objects.create(name='Cheap Toner', price=5, category=self.toners,
+                               image='uploads/product/test.jpg')
+        prices = self.client.get('/').context['facets']['prices']
+        self.assertEqual([link['count'] for link in prices], [2, 0, 1, 0])
+        prices = self.client.get('/category/toners').context['facets']['prices']
+        self.assertEqual([link['count'] for link in prices], [1, 0, 0, 0])
+        prices = self.client.get('/', {'category': 'serums'}).context['facets']['prices']
+        self.assertEqual([link['count'] for link in prices], [1, 0, 1, 0])
+
+    def test_filters_on_home_and_search(self):
+        response = self.client.get('/', {'price': '0-20'})
+        self.assertContains(response, 'Cheap Serum')
+        self.assertNotContains(response, 'Dear Serum')
+
+        response = self.client.get('/search/', {'q': 'serum', 'price': '50-100',
+                                                'category': 'serums'})
+        self.assertContains(response, 'Dear Serum')
+        self.assertNotContains(response, 'Cheap Serum')
+
+
+class ConditionalGetTest(TestCase):
+    '''This class tests the ETag and Last-Modified of the catalog pages.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Serums')
+        cls.product = Product.objects.create(name='Hyaluronic Serum', price=20,
+                                             category=cls.category,
+                                             image='uploads/product/test.jpg')
+
+    def setUp(self):
+        cache.clear()
+        catalog.clear()
+        facets.clear()
+
+    def test_revalidation_without_queries(self):
+        etag = self.client.get('/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_anonymous_if_modified_since(self):
+        last_modified = self.client.get('/category_summary/')['Last-Modified']
+        response = self.client.get('/category_summary/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_change_gives_new_etag(self):
+        url = f'/product/{self.product.id}'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Vitamin Serum'
+            self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Vitamin Serum')
+
+    def test_cart_change_gives_new_etag(self):
+        response = self.client.get('/')
+        self.client.post('/cart/add/', {'action': 'post', 'product_id': self.product.id,
+                                        'product_qty': 1})
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag'],
+                                   HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+class CardCacheTest(TestCase):
+    '''This class tests the cache of the rendered product cards.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Serums')
+        cls.products = [Product.objects.create(name=f'Serum {i}', price=20, category=cls.category,
+                                               image='uploads/product/test.jpg')
+                        for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_only_misses_are_rendered(self):
+        first = self.products[0]
+        with self.assertNumQueries(1):
+            cards.product_cards([first])
+
+        # one query for all the missing cards
+        with self.assertNumQueries(1):
+            rendered = cards.product_cards(self.products)
+        self.assertEqual(len(rendered), 3)
+        self.assertIn('Serum 2', rendered[2])
+
+        with self.assertNumQueries(0):
+            cards.product_cards(self.products)
+        self.assertEqual(cards.counters(), {'hits': 0, 'misses': 0})
+
+        with override_settings(CARD_CACHE_STATS=True):
+            cards.product_cards(self.products)
+        self.assertEqual(cards.counters(), {'hits': 3, 'misses': 0})
+
+    def test_saves_render_the_card_again(self):
+        cards.product_cards(self.products)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].price = 35
+            self.products[0].save()
+            self.category.name = 'Face Serums'
+            self.category.save()
+
+        rendered = cards.product_cards(self.products)
+        self.assertIn('35', rendered[0])
+        self.assertIn('Face Serums', rendered[1])
+
+
+class ImageVariantTest(TestCase):
+    '''This class tests the resized variants of the product images.'''
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        os.makedirs(os.path.join(self.media_root, 'uploads/product'))
+        Image.new('RGBA', (800, 400), (200, 100, 50, 255)).save(
+            os.path.join(self.media_root, 'uploads/product/cream.png'))
+        category = Category.objects.create(name='Creams')
+        self.product = Product.objects.create(name='Night Cream', price=20, category=category,
+                                              image='uploads/product/cream.png')
+
+    def test_variants_and_srcset(self):
+        self.assertTrue(images.needs_variants(self.product))
+        variants = images.make_variants(*images.job(self.product))
+        self.assertTrue(images.save_variants(self.product.id, variants))
+
+        # widths larger than the image are replaced by the image width
+        self.assertEqual([width for width, _ in variants['webp']], [320, 640, 800])
+        self.assertTrue(variants['placeholder'].startswith('data:image/jpeg;base64,'))
+
+        self.product.refresh_from_db()
+        self.assertFalse(images.needs_variants(self.product))
+        card = render_to_string('product_card.html', {'product': self.product})
+        self.assertIn('cream-320.webp 320w', card)
+        self.assertIn('width="800" height="400"', card)
+        self.assertIn('loading="lazy"', card)
+
+    def test_changed_image_is_not_overwritten(self):
+        variants = images.make_variants(*images.job(self.product))
+        Product.objects.filter(id=self.product.id).update(image='uploads/product/other.png')
+        self.assertFalse(images.save_variants(self.product.id, variants))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, variants['directory'])))
+
+    def test_jobs_keep_their_own_files(self):
+        first = images.make_variants(*images.job(self.product))
+        Image.new('RGB', (600, 300), 'white').save(
+            os.path.join(self.media_root, 'uploads/product/cream.png'))
+        second = images.make_variants(*images.job(self.product))
+        self.assertNotEqual(first['directory'], second['directory'])
+
+        # the first job is saved while the second one is still running
+        self.assertTrue(images.save_variants(self.product.id, first))
+        for _, name in second['webp'] + second['jpeg']:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+
+        # the old directory goes only when the product uses the new variants
+        self.assertTrue(images.save_variants(self.product.id, second))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, first['directory'])))
+        for _, name in second['webp'] + second['jpeg']:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+
+
+class MediaTest(TestCase):
+    '''This class tests the storage and the view of the uploaded files.'''
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        storage = media.HashedMediaStorage(location=self.media_root)
+        self.name = storage.save('uploads/product/cream.jpg', ContentFile(b'0123456789'))
+        self.url = f'/media/{self.name}'
+
+    def test_hashed_name(self):
+        storage = media.HashedMediaStorage(location=self.media_root)
+        self.assertRegex(self.name, r'^uploads/product/cream\.[0-9a-f]{12}\.jpg$')
+        self.assertEqual(storage.save('uploads/product/cream.jpg', ContentFile(b'0123456789')),
+                         self.name)
+        response = self.client.get(self.url)
+        self.assertEqual(response['Cache-Control'], media.IMMUTABLE)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_range_and_conditional_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+
+        etag = self.client.head(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+
+    @override_settings(MEDIA_OFFLOAD='x-accel')
+    def test_offload_reads_no_file(self):
+        with mock.patch('store.media.open', create=True, side_effect=AssertionError) as opened:
+            response = self.client.get(self.url, HTTP_RANGE='bytes=2-4')
+        opened.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response['Cache-Control'], media.IMMUTABLE)
+        self.assertEqual(response.content, b'')
+
+
+
+class CompressionTest(TestCase):
+    '''This class tests the compressed static files and pages.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Serums')
+        for i in range(5):
+            Product.objects.create(name=f'Serum {i}', price=20, category=category,
+                                   image='uploads/product/test.jpg')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_is_compressed(self):
+        plain = self.client.get('/')
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertTrue(response['ETag'].startswith('W/'))
+        # the gzip header has a file name of random length, against BREACH
+        self.assertTrue(response.content[3] & gzip.FNAME)
+
+        # too small to be worth it
+        response = self.client.get('/search/suggest', {'q': 'ser'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_brotli(self):
+        plain = self.client.get('/')
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        page = brotli.decompress(response.content)
+        # the page ends with a comment of random length, against BREACH
+        self.assertTrue(page.startswith(plain.content))
+        self.assertRegex(page[len(plain.content):], rb'^<!-- \w+ -->$')
+
+        # the JSON is only compressed with gzip
+        response = self.client.get('/search/suggest', {'q': 'ser'},
+                                   HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertNotEqual(response.get('Content-Encoding'), 'br')
+
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        storages = {**settings.STORAGES, 'staticfiles': {
+            'BACKEND': 'store.compression.CompressedManifestStaticFilesStorage'}}
+        with override_settings(STATIC_ROOT=static_root, STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            response = self.client.get(staticfiles_storage.url('css/styles.css'),
+                                       HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            with open(os.path.join(static_root, 'css/styles.css'), 'rb') as file:
+                self.assertEqual(brotli.decompress(b''.join(response.streaming_content)),
+                                 file.read())
+
+    def test_precompressed_static_file(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        storages = {**settings.STORAGES, 'staticfiles': {
+            'BACKEND': 'store.compression.CompressedManifestStaticFilesStorage'}}
+        with override_settings(STATIC_ROOT=static_root, STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = staticfiles_storage.url('css/styles.css')
+            self.assertRegex(url, r'styles\.[0-9a-f]{12}\.css$')
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertEqual(response['Cache-Control'], media.IMMUTABLE)
+            with open(os.path.join(static_root, 'css/styles.css'), 'rb') as file:
+                self.assertEqual(gzip.decompress(b''.join(response.streaming_content)),
+                                 file.read())
+
+            response = self.client.get(url)
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class WishlistTest(TestCase):
+    '''This class tests the wishlist.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Serums')
+        cls.products = [Product.objects.create(name=f'Serum {i}', price=20, category=category,
+                                               image='uploads/product/test.jpg')
+                        for i in range(3)]
+        cls.user = User.objects.create_user('customer', password='a-long-password')
+
+    def setUp(self):
+        cache.clear()
+        catalog.clear()
+        facets.clear()
+        self.client.force_login(self.user)
+
+    def add(self, product_id) -> dict:
+        '''This function presses the 'Add To Wishlist' button.'''
+        return self.client.post('/add-to-wishlist/', {'action': 'post',
+                                                      'product_id': product_id}).json()
+
+    def test_product_is_added_once(self):
+        product_id = self.products[0].id
+        with self.assertNumQueries(1):
+            self.assertTrue(add_to_wishlist(self.user, product_id))
+        self.assertEqual(self.add(product_id)['status'], 'Product Already In Wishlist')
+        self.assertEqual(self.add(self.products[1].id)['status'], 'Product Added to Wishlist')
+        self.assertEqual(self.add(999)['status'], 'No Such Product Found')
+        self.assertEqual(Wishlist.objects.filter(user=self.user).count(), 2)
+
+    def test_page_loads_products_with_the_rows(self):
+        for product in self.products:
+            Wishlist.objects.create(user=self.user, product=product)
+        self.client.get('/wishlist/')
+
+        # session, user, wishlist rows with their products and categories
+        with self.assertNumQueries(3):
+            response = self.client.get('/wishlist/')
+        self.assertContains(response, 'Serum 2')
+        self.assertContains(response, '20.00lv', count=3)
+
+    def test_move_to_cart(self):
+        first, second, third = self.products
+        for product in self.products:
+            Wishlist.objects.create(user=self.user, product=product)
+
+        self.client.post('/wishlist/to-cart/', {'product_id': [first.id, second.id]})
+        self.assertEqual(self.client.session['session_key'], {str(first.id): 1,
+                                                               str(second.id): 1})
+        self.assertEqual(list(Wishlist.objects.values_list('product_id', flat=True)),
+                         [third.id])
+
+        self.client.post('/wishlist/remove/', {'product_id': [third.id]})
+        self.assertFalse(Wishlist.objects.exists())
+
+    def test_sold_out_product_stays_in_wishlist(self):
+        first, second, _ = self.products
+        Product.objects.filter(id=second.id).update(stock=0)
+        Wishlist.objects.create(user=self.user, product=first)
+        Wishlist.objects.create(user=self.user, product=second)
+
+        response = self.client.post('/wishlist/to-cart/', follow=True)
+        self.assertEqual(self.client.session['session_key'], {str(first.id): 1})
+        self.assertEqual(list(Wishlist.objects.values_list('product_id', flat=True)),
+                         [second.id])
+        self.assertContains(response, 'Sold Out, Kept In Your Wishlist: Serum 1')
+
+    def test_listing_marks_without_queries(self):
+        first, second, _ = self.products
+        Wishlist.objects.create(user=self.user, product=first)
+        self.client.get('/')
+        self.add(second.id)
+
+        # session, user, product ids of the page
+        with self.assertNumQueries(3):
+            response = self.client.get('/')
+        self.assertContains(response, 'In Wishlist', count=2)
+        self.assertEqual(self.client.session['wishlist_ids'], [first.id, second.id])
+
+        self.client.post('/wishlist/remove/', {'product_id': [first.id]})
+        response = self.client.get(f'/product/{first.id}')
+        self.assertContains(response, 'Add To Wishlist')
@@ -12,10 +12,13 @@ urlpatterns = [
     path('update_info/', views.update_info, name='update_info'),
     path('update_password/', views.update_password, name='update_password'),
     path('product/<int:pk>', views.product, name='product'),
-    path('category/<str:category_name>', views.category, name='category'),
+    path('category/<slug:slug>', views.category, name='category'),
     path('category_summary/', views.category_summary, name='category_summary'),
     path('search/', views.search, name='search'),
+    path('search/suggest', views.search_suggest, name='search_suggest'),
     path('wishlist/', views.wishlist, name='wishlist'),
     path('add-to-wishlist/', views.addtowishlist, name='addtowishlist'),
+    path('wishlist/remove/', views.wishlist_remove, name='wishlist_remove'),
+    path('wishlist/to-cart/', views.wishlist_to_cart, name='wishlist_to_cart'),
 
 ]
@@ -2,75 +2,133 @@
 This module contains the functions needed when a certain page is opened
 or a button is clicked.
 '''
-import json
-from django.db.models import Q
-
 from django.http import HttpRequest, HttpResponse
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.http import JsonResponse
 from django.contrib.auth.models import User
+from django.views.decorators.http import require_POST
+from django.utils.text import slugify
 
-from cart.cart import Cart
+from cart.store import restore_cart
 
 from payment.forms import ShippingForm
 from payment.models import ShippingAddress
 
+from .cards import product_cards
+from .catalog import categories, category_by_slug
+from .conditional import catalog_page
+from .facets import facet_links, filter_products
 from .forms import SignUpForm, UpdateUserForm, ChangePasswordForm, UserInfoForm
-from .models import Product, Category, Profile, Wishlist
-
-
-def wishlist(request: HttpRequest) -> HttpResponse|None:
-    '''This function shows the wishlist of a user.'''
+from .inventory import sold_out_ids
+from .models import Product, Profile, Wishlist
+from .pagination import paginate, RankedPage
+from .search import search_products
+from .suggest import suggest
+from .wishlist import (add_to_wishlist, in_wishlist, move_to_cart, remember,
+                       remove_from_wishlist, wishlisted)
+
+
+def wishlist(request: HttpRequest) -> HttpResponse:
+    '''This function shows the wishlist of a user, a page at a time.
+    The products and their categories are loaded in the same query as the wishlist.'''
     if request.user.is_authenticated:
-        wishlist = Wishlist.objects.filter(user=request.user)
-        context = {'wishlist':wishlist}
+        rows = Wishlist.objects.filter(user=request.user).select_related('product__category')
+        context = {'wishlist':paginate(rows, request.GET)}
         return render(request, 'wishlist.html', context)
+    else:
+        messages.success(request, "You Must Be Logged In To Access This Page!")
+        return redirect('home')
 
-def addtowishlist(request: HttpRequest) -> HttpResponse|None:
+def addtowishlist(request: HttpRequest) -> JsonResponse|None:
     '''This function is triggered when the 'Add to wishlist' button is pressed.
-    It checks first if the user is logged in and if the product is already in the list/'''
+    It checks first if the user is logged in, then adds the product with one insert.'''
     if  request.POST.get('action') == 'post':
         if request.user.is_authenticated:
-            product_id = request.POST.get('product_id')
-            if Product.objects.get(id=product_id):
-                if Wishlist.objects.filter(user=request.user, product_id=product_id):
-                    messages.success(request, "Product Already In Wishlist")
-                    return JsonResponse({'status':"yes"})
-                else:
-                    Wishlist.objects.create(user=request.user, product_id=product_id)
-                    #messages.success(request, "Product Added to Wishlist")
-                    return JsonResponse({'status':"Product Added to Wishlist"})
-            else:
-                messages.success(request, "No Such Product Found")
+            try:
+                product_id = int(request.POST.get('product_id'))
+                added = add_to_wishlist(request.user, product_id)
+            except (TypeError, ValueError, Product.DoesNotExist):
+                return JsonResponse({'status':"No Such Product Found"}, status=404)
+            remember(request, added=[product_id])
+            if added:
+                return JsonResponse({'status':"Product Added to Wishlist"})
+            return JsonResponse({'status':"Product Already In Wishlist"})
         else:
-            messages.success(request, "You Must Be Logged In To Access This Page!")
+            return JsonResponse({'status':"You Must Be Logged In To Access This Page!"},
+                                status=403)
+
+def selected_products(request: HttpRequest) -> list:
+    '''This function returns the ids of the products ticked on the wishlist page.'''
+    return [int(product_id) for product_id in request.POST.getlist('product_id')
+            if product_id.isdigit()]
+
+@require_POST
+def wishlist_remove(request: HttpRequest) -> HttpResponse:
+    '''This function removes the ticked products from the wishlist.'''
+    if request.user.is_authenticated:
+        product_ids = selected_products(request)
+        remove_from_wishlist(request.user, product_ids)
+        remember(request, removed=product_ids)
+        messages.success(request, "Products Removed From Wishlist")
+        return redirect('wishlist')
+    else:
+        messages.success(request, "You Must Be Logged In To Access This Page!")
+        return redirect('home')
+
+@require_POST
+def wishlist_to_cart(request: HttpRequest) -> HttpResponse:
+    '''This function moves the ticked products (or the whole wishlist if none are ticked)
+    to the cart.'''
+    if request.user.is_authenticated:
+        moved, sold_out = move_to_cart(request, selected_products(request) or None)
+        messages.success(request, f"{len(moved)} Products Moved To Your Cart")
+        if sold_out:
+            messages.success(request, f"Sold Out, Kept In Your Wishlist: {', '.join(sold_out)}")
+        return redirect('cart_summary')
     else:
-        return JsonResponse({'status':"Product Added to Wishlist"})
+        messages.success(request, "You Must Be Logged In To Access This Page!")
+        return redirect('home')
 
 
 def search(request: HttpRequest) -> HttpResponse:
     '''This function is used when the search button is pressed.
-    It searches through the products for the ones with a match in the description or the name.
+    It searches the name and the description of the products with the full-text index,
+    best match first. The search is a GET request, so the result pages have their own links.
     '''
-    if request.method == "POST":
-        searched = request.POST['searched']
-        searched = Product.objects.filter(
-            Q(name__icontains=searched) | Q(description__icontains = searched)
-            )
-
-        if not searched:
+    searched = request.GET.get('q', '').strip()
+    if searched:
+        product_ids = search_products(searched)
+        if request.GET.get('category') or request.GET.get('price'):
+            # the filters are checked on the primary key index of the matching products
+            allowed = set(filter_products(Product.objects.filter(id__in=product_ids), request.GET)
+                          .values_list('id', flat=True))
+            product_ids = [product_id for product_id in product_ids if product_id in allowed]
+        results = RankedPage(Product.objects.only('id'), product_ids, request.GET)
+        facets = facet_links(request.GET)
+
+        if not results:
             messages.success(request, "That Product Does Not Exist.")
-            return render(request, 'search.html', {})
+            return render(request, 'search.html', {'q':searched, 'facets':facets})
 
         else:
-            return render(request, 'search.html', {'searched':searched})
+            return render(request, 'search.html',
+                          {'searched':results, 'cards':product_cards(results),
+                           'wishlisted':wishlisted(request), 'sold_out':sold_out_ids(),
+                           'q':searched, 'facets':facets})
 
     else:
         return render(request, 'search.html', {})
 
 
+def search_suggest(request: HttpRequest) -> JsonResponse:
+    '''This function returns the products and categories whose names start with
+    what was typed in the search box. It reads only the in-memory prefix index,
+    so it can be called on every key press.'''
+    return JsonResponse({'suggestions': suggest(request.GET.get('q', ''))})
+
+
 def update_info(request: HttpRequest) -> HttpResponse:
     '''This function is used when a user needs to fill in 
     or change their billing or shipping information.'''
@@ -134,33 +192,48 @@ def update_password(request: HttpRequest) -> HttpResponse|None:
         return redirect('home')
 
 
-def category(request: HttpRequest, category_name: str) -> HttpResponse:
-    '''This function is used when a customer wants to look through products by a chosen category.'''
-    category_name = category_name.replace('-',' ')
-    try:
-        category = Category.objects.get(name=category_name)
-        products = Product.objects.filter(category=category)
-        return render(request, 'category.html', {'products':products, 'category':category})
-    except:
-        messages.success(request, ("That Category Doesn't Exist."))
-        return redirect('home')
+@catalog_page
+def category(request: HttpRequest, slug: str) -> HttpResponse:
+    '''This function is used when a customer wants to look through products by a chosen category.
+    The category comes from the category cache, so only the products are queried.'''
+    category = category_by_slug(slug)
+    if category is None:
+        # old links used the name of the category, like 'Sun-Protection'
+        category = category_by_slug(slugify(slug))
+        if category is None:
+            messages.success(request, ("That Category Doesn't Exist."))
+            return redirect('home')
+        return redirect('category', slug=category.slug, permanent=True)
+
+    products = paginate(filter_products(Product.objects.only('id'), request.GET)
+                        .filter(category_id=category.id), request.GET)
+    return render(request, 'category.html',
+                  {'products':products, 'cards':product_cards(products), 'category':category,
+                   'wishlisted':wishlisted(request), 'sold_out':sold_out_ids(),
+                   'facets':facet_links(request.GET, category)})
 
+@catalog_page
 def category_summary(request: HttpRequest) -> HttpResponse:
     '''This function lists all categories when in the Category page.'''
-    categories = Category.objects.all()
-    return render(request, 'category_summary.html', {"categories":categories})
+    return render(request, 'category_summary.html', {"categories":categories()})
 
+@catalog_page
 def product(request: HttpRequest, pk: int) -> HttpResponse:
     '''This function is used when the 'View Product' button is clicked.
     It takes the customer to the product page.
     '''
-    product = Product.objects.get(id=pk)
-    return render(request, 'product.html', {'product':product})
+    product = get_object_or_404(Product, id=pk)
+    return render(request, 'product.html',
+                  {'product':product, 'in_wishlist':in_wishlist(request, product.id)})
 
+@catalog_page
 def home(request: HttpRequest) -> HttpResponse:
     '''This function is for the Home page where we want all the products to be listed.'''
-    products = Product.objects.all()
-    return render(request, 'home.html', {'products':products})
+    products = paginate(filter_products(Product.objects.only('id'), request.GET), request.GET)
+    return render(request, 'home.html',
+                  {'products':products, 'cards':product_cards(products),
+                   'wishlisted':wishlisted(request), 'sold_out':sold_out_ids(),
+                   'facets':facet_links(request.GET)})
 
 def about(request: HttpRequest) -> HttpResponse:
     '''This function is for the About page.'''
@@ -176,14 +249,7 @@ def login_user(request: HttpRequest) -> HttpResponse:
         user = authenticate(request, username=username, password=password)
         if user is not None:
             login(request, user)
-            current_user = Profile.objects.get(user__id=request.user.id)
-            saved_cart = current_user.last_cart
-            if saved_cart:
-                dict_cart = json.loads(saved_cart)
-                cart = Cart(request)
-                for key, value in dict_cart.items():
-                    #key is a str
-                    cart.add(product=key, quantity=value, db_add = True)
+            restore_cart(request, user)
 
             messages.success(request, ("You Have Been Logged In!"))
             return redirect('home')
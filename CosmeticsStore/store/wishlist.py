@@ -0,0 +1,102 @@
+'''This module contains the changes of a customer's wishlist
+and the ids of the wishlist products kept in the session.
+The ids are read with one query the first time they are needed
+and then changed together with the wishlist, so the listings can mark
+the wishlist products without a query.'''
+from bisect import bisect_left, insort
+
+from django.db import connection
+
+from cart.cart import Cart
+from .models import Product, Wishlist
+
+SESSION_KEY = 'wishlist_ids'
+
+
+def wishlist_ids(request) -> list:
+    '''This function returns the sorted ids of the products in the user's wishlist.
+    They are loaded into the session the first time.'''
+    if not request.user.is_authenticated:
+        return []
+    ids = request.session.get(SESSION_KEY)
+    if ids is None:
+        ids = list(Wishlist.objects.filter(user=request.user)
+                   .order_by('product_id').values_list('product_id', flat=True))
+        request.session[SESSION_KEY] = ids
+    return ids
+
+
+def wishlisted(request) -> set:
+    '''This function returns the ids of the wishlist products as a set, for the templates.'''
+    return set(wishlist_ids(request))
+
+
+def in_wishlist(request, product_id: int) -> bool:
+    '''This function tells if a product is in the user's wishlist.'''
+    ids = wishlist_ids(request)
+    position = bisect_left(ids, product_id)
+    return position < len(ids) and ids[position] == product_id
+
+
+def remember(request, added: list = (), removed: list = ()) -> None:
+    '''This function changes the ids in the session after the wishlist was changed.
+    Nothing is done if they were not loaded yet.'''
+    ids = request.session.get(SESSION_KEY)
+    if ids is None:
+        return
+    for product_id in added:
+        position = bisect_left(ids, product_id)
+        if position == len(ids) or ids[position] != product_id:
+            insort(ids, product_id)
+    removed = set(removed)
+    request.session[SESSION_KEY] = [product_id for product_id in ids
+                                    if product_id not in removed]
+
+
+def add_to_wishlist(user, product_id: int) -> bool:
+    '''This function adds a product to the wishlist with a single
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING. The product is checked by the SELECT
+    and the unique constraint ignores a product that is already there,
+    so two clicks at the same time can't add it twice.
+    It returns False if the product was already in the wishlist
+    and raises Product.DoesNotExist if there is no such product.'''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {Wishlist._meta.db_table} (user_id, product_id) '
+            f'SELECT %s, id FROM {Product._meta.db_table} WHERE id = %s '
+            f'ON CONFLICT (user_id, product_id) DO NOTHING',
+            [user.id, product_id])
+        added = cursor.rowcount == 1
+    # only looked up when nothing was inserted
+    if not added and not Product.objects.filter(id=product_id).exists():
+        raise Product.DoesNotExist(f'No product with id {product_id}.')
+    return added
+
+
+def remove_from_wishlist(user, product_ids: list) -> int:
+    '''This function removes products from the wishlist and returns how many were removed.'''
+    return Wishlist.objects.filter(user=user, product_id__in=product_ids).delete()[0]
+
+
+def move_to_cart(request, product_ids: list|None = None) -> tuple:
+    '''This function adds the wishlist products (all of them, or the given ones)
+    to the cart with quantity 1 and removes them from the wishlist.
+    The products are loaded once, by Cart.apply, and the same query gives the cart its lines.
+    Sold out products can't be added to the cart, so they stay in the wishlist.
+    It returns the ids of the products that were moved and the names of the sold out ones.'''
+    rows = Wishlist.objects.filter(user=request.user)
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=product_ids)
+    moved, sold_out = [], []
+    for product_id, name, stock in rows.values_list('product_id', 'product__name',
+                                                    'product__stock'):
+        if stock == 0:
+            sold_out.append(name)
+        else:
+            moved.append(product_id)
+    if moved:
+        Cart(request).apply([{'action': 'add', 'product_id': product_id, 'product_qty': 1}
+                             for product_id in moved])
+        remove_from_wishlist(request.user, moved)
+        remember(request, removed=moved)
+    return moved, sold_out